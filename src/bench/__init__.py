@@ -0,0 +1,13 @@
+"""
+Бенчмарки и нагрузочный тест API.
+
+Запуск из каталога src:
+
+    python -m bench                          # всё, результат в bench/baseline.json (не в git)
+    python -m bench --only micro --out bench/new.json --compare bench/baseline.json
+    python -m bench --only payloads          # размер и сериализация ответов по режимам
+    python -m bench --only load --latency 0.05 --concurrency 64 --requests 2000
+
+Результат — JSON с окружением (коммит, версии) и измерениями; --compare
+печатает разницу с прошлым результатом и помечает ухудшения.
+"""
@@ -0,0 +1,110 @@
+import argparse
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import time
+import numpy as np
+
+# Порог, после которого изменение считается заметным (доля)
+THRESHOLD = 0.10
+
+
+def _environment() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = None
+    return {
+        "commit": commit or None,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def _flatten(results: dict) -> dict:
+    """Сравниваемые величины: время микробенчмарков и p50/p95 нагрузочного теста."""
+    values = {}
+    for name, result in results.get("micro", {}).items():
+        values[f"micro {name}"] = (result["median_us"], "us")
+    for name, result in results.get("payloads", {}).items():
+        values[f"payload {name} bytes"] = (result["bytes"], "B")
+        for encoder, value in result["serialize_us"].items():
+            values[f"payload {name} {encoder}"] = (value, "us")
+    load = results.get("load")
+    if load:
+        values["load rps"] = (load["total"]["rps"], "rps")
+        for name, endpoint in load["endpoints"].items():
+            for key in ("p50_ms", "p95_ms"):
+                values[f"load {name} {key}"] = (endpoint[key], "ms")
+    return values
+
+
+def compare(old: dict, new: dict):
+    """Печатает изменения относительно прошлого результата."""
+    print(f"\nBaseline {old['environment'].get('commit')} -> current {new['environment'].get('commit')}")
+    old_values, new_values = _flatten(old), _flatten(new)
+    for name, (value, unit) in new_values.items():
+        if name not in old_values or old_values[name][0] in (None, 0) or value is None:
+            continue
+        before = old_values[name][0]
+        change = (value - before) / before
+        # Для rps больше — лучше, для времени — хуже
+        worse = change < -THRESHOLD if unit == "rps" else change > THRESHOLD
+        better = change > THRESHOLD if unit == "rps" else change < -THRESHOLD
+        mark = "SLOWER" if worse else "faster" if better else ""
+        print(f"  {name:<45} {before:>12.3f} -> {value:>12.3f} {unit:<3} {change:+7.1%} {mark}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарки и нагрузочный тест API")
+    parser.add_argument("--only", choices=("micro", "payloads", "load"), help="запустить только одну часть")
+    parser.add_argument("--out", default="bench/baseline.json", help="куда записать результат (JSON)")
+    parser.add_argument("--compare", help="прошлый результат для сравнения")
+    parser.add_argument("--requests", type=int, default=3000, help="запросов в нагрузочном тесте")
+    parser.add_argument("--concurrency", type=int, default=32, help="одновременных клиентов")
+    parser.add_argument("--latency", type=float, default=0.02, help="задержка заглушки OpenWeather, сек")
+    parser.add_argument("--cities", type=int, default=200, help="разных городов в нагрузке")
+    args = parser.parse_args()
+
+    # Журнал запросов и отладка не должны влиять на замеры
+    logging.disable(logging.INFO)
+
+    results = {"environment": _environment()}
+    if args.only in (None, "micro"):
+        from bench import micro
+        results["micro"] = micro.run()
+        for name, result in results["micro"].items():
+            print(f"  {name:<40} {result['median_us']:>12.3f} us (min {result['min_us']:.3f})")
+    if args.only in (None, "payloads"):
+        from bench import payloads
+        results["payloads"] = payloads.run()
+        for name, result in results["payloads"].items():
+            sizes = ", ".join(f"{key[:-6]} {value} B" for key, value in result.items() if key.endswith("_bytes"))
+            timings = ", ".join(f"{key} {value:.1f} us" for key, value in result["serialize_us"].items())
+            print(f"  {name:<20} {result['bytes']:>6} B ({sizes}); {timings}")
+    if args.only in (None, "load"):
+        from bench import load
+        results["load"] = load.run(args.requests, args.concurrency, args.latency, args.cities)
+        total = results["load"]["total"]
+        print(f"  load: {total['requests']} requests in {total['seconds']} s, {total['rps']} rps")
+        for name, endpoint in results["load"]["endpoints"].items():
+            print(f"    {name:<20} p50 {endpoint['p50_ms']} ms, p95 {endpoint['p95_ms']} ms, "
+                  f"p99 {endpoint['p99_ms']} ms, errors {endpoint['errors']}")
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+    print(f"Results written to {args.out}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(json.load(f), results)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,103 @@
+"""
+Нагрузочный тест в одном процессе: приложение вызывается через
+httpx.ASGITransport, OpenWeather заменён заглушкой с заданной задержкой,
+справочник мест — во временном файле. Сеть не используется.
+"""
+import asyncio
+import itertools
+import os
+import tempfile
+import time
+from contextlib import asynccontextmanager
+import httpx
+from bench.timing import percentiles
+from stubs.openweather import create_app
+from services import weather_service
+
+CROPS = ("maize", "Zea mays", "wheat", "coffee", "Coffea arabica", "cassava", "rice", "sorghum")
+
+
+def _cities(count: int) -> list[str]:
+    # Повторяющиеся написания одного города проверяют нормализацию и кэш
+    base = [f"City{i}" for i in range(count)]
+    return base + [f" city{i} " for i in range(0, count, 4)]
+
+
+def _requests(cities: list[str]):
+    """Бесконечная смесь запросов: (имя эндпоинта, путь, параметры)."""
+    crops = itertools.cycle(CROPS)
+    for city in itertools.cycle(cities):
+        crop = next(crops)
+        yield "crops", "/crops/", {"name": crop}
+        yield "weather", "/weather/", {"city": city}
+        yield "recommend_check", "/recommend/check", {"city": city, "crop": crop}
+
+
+@asynccontextmanager
+async def stubbed_app(latency: float):
+    """
+    Клиент приложения с заглушкой OpenWeather и пустым справочником мест
+    во временном каталоге; после выхода всё возвращается как было.
+    """
+    import main
+
+    stub = create_app(latency=latency)
+    client = weather_service.weather_client
+    resolver = weather_service.location_resolver
+    saved = client.transport, client.base_url, resolver.store_path, resolver._store
+    client.transport = httpx.ASGITransport(app=stub)
+    client.base_url = "http://stub/data/2.5"
+    await client.aclose()  # новый пул с транспортом заглушки
+    weather_service.weather_cache.clear()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        resolver.store_path = os.path.join(tmp, "locations.sqlite")
+        resolver._store = None
+        resolver.cache.clear()
+        try:
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://app") as app_client:
+                yield app_client, stub
+        finally:
+            await client.aclose()
+            client.transport, client.base_url, resolver.store_path, resolver._store = saved
+
+
+async def _run(requests: int, concurrency: int, latency: float, cities: int) -> dict:
+    latencies: dict[str, list[float]] = {}
+    errors: dict[str, int] = {}
+    queue = _requests(_cities(cities))
+    remaining = requests
+
+    async with stubbed_app(latency) as (app_client, stub):
+        async def worker():
+            nonlocal remaining
+            while remaining > 0:
+                remaining -= 1
+                name, path, params = next(queue)
+                start = time.perf_counter()
+                response = await app_client.get(path, params=params)
+                latencies.setdefault(name, []).append((time.perf_counter() - start) * 1000)
+                if response.status_code != 200 or "error" in response.json():
+                    errors[name] = errors.get(name, 0) + 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    total = sum(len(values) for values in latencies.values())
+    return {
+        "config": {"requests": requests, "concurrency": concurrency, "stub_latency_s": latency, "cities": cities},
+        "total": {"requests": total, "seconds": round(elapsed, 3), "rps": round(total / elapsed, 1)},
+        "stub_calls": {"weather": stub.state.requests, "geocoding": stub.state.geocoding_requests},
+        "endpoints": {
+            name: {"requests": len(values), "errors": errors.get(name, 0), **percentiles(values)}
+            for name, values in latencies.items()
+        },
+    }
+
+
+def run(requests: int = 3000, concurrency: int = 32, latency: float = 0.02, cities: int = 200) -> dict:
+    # База загружается до замера — как после прогрева при старте сервера
+    from services.ecocrop_service import ecocrop_service
+    ecocrop_service.warm_up()
+    return asyncio.run(_run(requests, concurrency, latency, cities))
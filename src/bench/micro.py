@@ -0,0 +1,80 @@
+"""Микробенчмарки: поиск культур, оценка пригодности, загрузка базы."""
+import time
+import numpy as np
+from config import ECOCROP_PATH
+from services import ecocrop_service as ecocrop_module
+from services.ecocrop_snapshot import load_snapshot, default_snapshot_path, read_csv_table
+from services.suitability_service import best_season, calculate_suitability, score_crops, score_forecast, score_season
+from bench.timing import measure
+
+# Запросы поиска культуры: (название бенчмарка, запрос)
+LOOKUPS = (
+    ("exact_scientific", "Zea mays"),
+    ("exact_common", "maize"),
+    ("partial", "arabica"),
+    ("miss", "qwertyuiop"),
+)
+
+CONDITIONS = {"temp": 22.0, "rain": 900.0, "ph": 6.5, "lat": 45.0, "altitude": 300.0, "day_length": 13.5}
+
+# Условные климатические нормы умеренного пояса для сезонной оценки
+TAVG = np.array([-2, 0, 5, 10, 15, 19, 21, 20, 16, 10, 4, 0], dtype=float)
+PREC = np.array([40, 35, 45, 55, 70, 80, 75, 70, 60, 55, 50, 45], dtype=float)
+# Прогноз 5 дней / 3 часа с суточным ходом температуры
+FORECAST_TEMP = 12 + 8 * np.sin(np.arange(40) / 8 * 2 * np.pi)
+
+
+def bench_load(repeat: int = 3) -> dict:
+    """Загрузка базы: снимок (mmap), CSV через pandas и весь сервис с индексами."""
+    results = {}
+    snapshot_path = ecocrop_module.ECOCROP_SNAPSHOT_PATH or default_snapshot_path(ECOCROP_PATH)
+    if load_snapshot(snapshot_path, ECOCROP_PATH) is not None:
+        results["load.snapshot"] = measure(lambda: load_snapshot(snapshot_path, ECOCROP_PATH), repeat=repeat)
+    results["load.csv"] = measure(lambda: read_csv_table(ECOCROP_PATH), repeat=repeat, min_time=0)
+
+    # Полная загрузка сервиса (таблица + индекс названий + диапазоны)
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        ecocrop_module.EcoCropService()
+        timings.append((time.perf_counter() - start) * 1e6)
+    results["load.service"] = {"median_us": round(sorted(timings)[len(timings) // 2], 3),
+                               "min_us": round(min(timings), 3), "calls": repeat}
+    return results
+
+
+def bench_lookup(service) -> dict:
+    results = {}
+    for name, query in LOOKUPS:
+        results[f"lookup.{name}"] = measure(lambda: service.index.lookup(query))
+        results[f"get_crop.{name}"] = measure(lambda: service.get_crop(query))
+    results["search.prefix"] = measure(lambda: service.search("cof", limit=10))
+    results["search.typo"] = measure(lambda: service.search("cofea arabika", limit=10))
+    return results
+
+
+def bench_scoring(service) -> dict:
+    crop = service.get_crop("maize")
+    row = service.find_row("maize")
+    single = {col: values[row:row + 1] for col, values in service.ranges.items()}
+    cells = 65536
+    lat = np.linspace(-60, 60, cells)
+    tavg = np.tile(TAVG, (cells, 1))
+    prec = np.tile(PREC, (cells, 1))
+    return {
+        "score.one_crop": measure(lambda: calculate_suitability(crop, **CONDITIONS)),
+        "score.all_crops": measure(lambda: score_crops(service.ranges, **CONDITIONS)),
+        "score.recommend": measure(lambda: service.recommend(limit=10, **CONDITIONS)),
+        "score.season_all_crops": measure(lambda: score_season(service.ranges, TAVG, PREC, 4, lat=45.0)),
+        "score.forecast_all_crops": measure(
+            lambda: score_forecast(service.ranges, FORECAST_TEMP, FORECAST_TEMP - 1, FORECAST_TEMP + 1)),
+        "score.best_season_64k_cells": measure(lambda: best_season(single, tavg, prec, lat=lat), repeat=3),
+    }
+
+
+def run() -> dict:
+    results = bench_load()
+    service = ecocrop_module.ecocrop_service.load()
+    results.update(bench_lookup(service))
+    results.update(bench_scoring(service))
+    return results
@@ -0,0 +1,66 @@
+"""
+Размер и стоимость ответов /recommend/check и /crops по режимам: полный,
+compact и выборка полей (как в web/recommend.html). Для каждого режима —
+байты до и после сжатия, время сериализации (json, orjson, путь FastAPI
+по умолчанию через jsonable_encoder) и время сжатия.
+"""
+import asyncio
+import json
+from fastapi.encoders import jsonable_encoder
+from bench.load import stubbed_app
+from bench.timing import measure
+from routers.recommend import CHECK_COMPACT_FIELDS
+from services.compression import brotli, compress
+from services.ecocrop_service import EcoCropService
+from services.responses import dumps, orjson, project
+
+# Поля, которые показывает web/recommend.html
+UI_FIELDS = (
+    "city", "crop", "suitable", "score", "details", "weather",
+    *(f"crop_info.{col}" for col in ("ScientificName", "CAT", "LISPA", "PLAT", "TOPMN", "TOPMX", "ROPMN", "ROPMX",
+                                     "TEXT", "DRA", "PHOPMN", "PHOPMX", "FER", "CLIZ", "GMIN", "GMAX")),
+)
+
+MODES = {
+    "check.full": ("check", None),
+    "check.compact": ("check", CHECK_COMPACT_FIELDS),
+    "check.ui_fields": ("check", UI_FIELDS),
+    "crops.full": ("crops", None),
+    "crops.compact": ("crops", EcoCropService.COMPACT_FIELDS),
+}
+
+
+async def _samples() -> dict:
+    """Полные ответы эндпоинтов, полученные через само приложение."""
+    async with stubbed_app(latency=0) as (app_client, _):
+        check = await app_client.get("/recommend/check", params={"city": "Paris", "crop": "maize"})
+        crops = await app_client.get("/crops/", params={"name": "maize"})
+    return {"check": check.json(), "crops": crops.json()}
+
+
+def _default_fastapi(data) -> bytes:
+    # Так FastAPI сериализует возвращённый словарь
+    return json.dumps(jsonable_encoder(data), ensure_ascii=False, allow_nan=False,
+                      indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def run() -> dict:
+    from services.ecocrop_service import ecocrop_service
+    ecocrop_service.warm_up()
+    samples = asyncio.run(_samples())
+
+    encodings = ["gzip", *(["br"] if brotli is not None else [])]
+    encoders = ["json", *(["orjson"] if orjson is not None else [])]
+    results = {}
+    for mode, (endpoint, fields) in MODES.items():
+        full = samples[endpoint]
+        body = dumps(project(full, fields))
+        serialize = {"fastapi": measure(lambda: _default_fastapi(project(full, fields)))["median_us"]}
+        for encoder in encoders:
+            serialize[encoder] = measure(lambda: dumps(project(full, fields), encoder))["median_us"]
+        result = {"bytes": len(body), "serialize_us": serialize}
+        for encoding in encodings:
+            result[f"{encoding}_bytes"] = len(compress(body, encoding))
+            result[f"{encoding}_us"] = measure(lambda: compress(body, encoding))["median_us"]
+        results[mode] = result
+    return results
@@ -0,0 +1,39 @@
+import statistics
+import time
+
+
+def measure(func, repeat: int = 7, min_time: float = 0.05) -> dict:
+    """
+    Время одного вызова func, мкс. Число вызовов в серии подбирается так,
+    чтобы серия шла не меньше min_time; серий — repeat. В отчёте медиана
+    и минимум по сериям (минимум меньше всего зависит от шума).
+    """
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        number *= 2 if elapsed == 0 else max(2, min(10, int(min_time / elapsed) + 1))
+
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        runs.append((time.perf_counter() - start) / number * 1e6)
+    return {
+        "median_us": round(statistics.median(runs), 3),
+        "min_us": round(min(runs), 3),
+        "calls": number * repeat,
+    }
+
+
+def percentiles(values: list[float], points=(50, 95, 99)) -> dict:
+    """Перцентили задержек (мс) по отсортированной выборке."""
+    if not values:
+        return {f"p{p}_ms": None for p in points}
+    ordered = sorted(values)
+    return {f"p{p}_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))], 3) for p in points}
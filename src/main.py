@@ -1,18 +1,90 @@
-from fastapi import FastAPI
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
-from routers import weather, crops, recommend
+from services import startup  # первым: точка отсчёта для отчёта о запуске
+
+with startup.timed("import.fastapi"):
+    import asyncio
+    import logging
+    from contextlib import asynccontextmanager
+    from fastapi import FastAPI
+    from fastapi.staticfiles import StaticFiles
+    from fastapi.responses import FileResponse, PlainTextResponse
+
+with startup.timed("import.routers"):
+    import config
+    from routers import weather, crops, recommend, raster
+    from services.ecocrop_service import ECOCROP_RELOAD_INTERVAL, DatasetVersionMiddleware, ecocrop_service
+    from services.compression import CompressionMiddleware
+    from services.metrics import MetricsMiddleware, registry
+    from services.raster_service import shutdown_pool
+    from services.weather_service import weather_client
+
+# Когда загружать базу EcoCrop (можно переопределить в config.py):
+#   "background" — в фоне сразу после старта, сервер принимает запросы;
+#   "startup"    — до приёма запросов;
+#   "lazy"       — при первом запросе, которому она нужна.
+ECOCROP_WARMUP = getattr(config, "ECOCROP_WARMUP", "background")
+
+
+async def _warm_up():
+    await asyncio.to_thread(ecocrop_service.warm_up)
+    logging.info(f"EcoCrop loaded, startup phases: {startup.report()['phases_ms']}")
+
+
+def _log_warm_up_failure(task: asyncio.Task):
+    # Иначе ошибка фоновой загрузки всплывёт только в первом запросе к базе
+    if not task.cancelled() and task.exception() is not None:
+        logging.error("EcoCrop background warm-up failed", exc_info=task.exception())
+
+
+async def _watch_dataset():
+    """Следит за файлом базы; новая версия собирается в потоке и подменяет текущую."""
+    while True:
+        await asyncio.sleep(ECOCROP_RELOAD_INTERVAL)
+        try:
+            await asyncio.to_thread(ecocrop_service.reload_if_changed)
+        except Exception:
+            # Например, гонка stat() с перестановкой симлинка: проверим в следующий раз
+            logging.exception("EcoCrop dataset check failed")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    tasks = []
+    if ECOCROP_WARMUP == "startup":
+        await _warm_up()
+    elif ECOCROP_WARMUP == "background":
+        warm_up = asyncio.create_task(_warm_up())
+        warm_up.add_done_callback(_log_warm_up_failure)
+        tasks.append(warm_up)
+    if ECOCROP_RELOAD_INTERVAL:
+        tasks.append(asyncio.create_task(_watch_dataset()))
+    yield
+    for task in tasks:
+        if not task.done():
+            task.cancel()
+    # Закрываем пул соединений к OpenWeather и процессы расчёта растров
+    await weather_client.aclose()
+    shutdown_pool()
+
 
 app = FastAPI(
     title="Agro Intelligence API",
     description="API для проверки пригодности условий выращивания по данным FAO EcoCrop",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
 )
 
+# Сжатие ответов gzip/brotli по Accept-Encoding
+app.add_middleware(CompressionMiddleware)
+# Задержка каждого запроса по маршрутам (включая сжатие) и выборочный журнал запросов
+app.add_middleware(MetricsMiddleware)
+# Версия базы EcoCrop в заголовке каждого ответа
+app.add_middleware(DatasetVersionMiddleware)
+
 # Подключаем роутеры
 app.include_router(weather.router, prefix="/weather", tags=["Weather"])
 app.include_router(crops.router, prefix="/crops", tags=["Crops"])
 app.include_router(recommend.router, prefix="/recommend", tags=["Recommend"])
+app.include_router(raster.router, prefix="/raster", tags=["Raster"])
 
 # Подключаем папку с веб-страницами
 app.mount("/web", StaticFiles(directory="web"), name="web")
@@ -21,6 +93,21 @@ app.mount("/web", StaticFiles(directory="web"), name="web")
 def root():
     return {"message": "Agro Intelligence API is running. Go to /docs 🚀"}
 
+@app.get("/startup", include_in_schema=False)
+def startup_report():
+    """Длительности фаз запуска: импорты, загрузка базы, построение индексов."""
+    return {
+        **startup.report(),
+        "ecocrop_loaded": ecocrop_service.loaded,
+        "ecocrop_version": ecocrop_service.version,
+        "ecocrop_path": ecocrop_service.path,
+    }
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Метрики в текстовом формате Prometheus."""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
 # Эндпоинт для отображения веб-интерфейса Recommend
 @app.get("/recommend-ui", include_in_schema=False)
 def recommend_ui():
@@ -1,11 +1,58 @@
-from fastapi import APIRouter, Query
-from services.ecocrop_service import get_crop
+from email.utils import parsedate_to_datetime
+from fastapi import APIRouter, Query, Request, Response
+from services.ecocrop_service import EcoCropService, get_crop_payload, search_crops
+from services.responses import parse_fields
 
 router = APIRouter()
 
+
+def _not_modified(request: Request, etag: str, last_modified: str) -> bool:
+    """Проверка условного запроса: If-None-Match важнее If-Modified-Since."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # Слабое сравнение (RFC 9110, 13.1.2): W/"x" и "x" совпадают
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in tags or etag.removeprefix("W/") in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return parsedate_to_datetime(if_modified_since) >= parsedate_to_datetime(last_modified)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
 @router.get("/")
-def check_crop(name: str = Query(..., description="Название культуры (carrot, okra, onion, Wheat, Maize , Papaya, Pineapple, Sugarcane,  Coffee, )")): # tomato, cabbage,
-    result = get_crop(name=name)
+def check_crop(
+    request: Request,
+    name: str = Query(..., description="Название культуры (carrot, okra, onion, Wheat, Maize , Papaya, Pineapple, Sugarcane,  Coffee, )"), # tomato, cabbage,
+    fields: str | None = Query(None, description="Только эти поля через запятую, например: ScientificName,TOPMN,TOPMX"),
+    compact: bool = Query(False, description="Только названия и диапазоны, по которым идёт оценка"),
+):
+    # Явный список полей важнее compact
+    projection = parse_fields(fields) or (EcoCropService.COMPACT_FIELDS if compact else None)
+    result = get_crop_payload(name=name, fields=projection)
     if not result:
         return {"error": f"Культура '{name}' не найдена"}
-    return result
+
+    # Запись уже сериализована — отдаём байты без повторного JSON-кодирования
+    body, etag, last_modified = result
+    # Тело может уйти сжатым (CompressionMiddleware), поэтому ETag слабый —
+    # один и тот же и в 200 при любом Accept-Encoding, и в 304
+    etag = "W/" + etag
+    # no-cache: клиент хранит ответ, но перед использованием сверяет ETag —
+    # после горячей перезагрузки базы он сразу получит новую запись
+    headers = {"ETag": etag, "Last-Modified": last_modified, "Cache-Control": "no-cache",
+               "Vary": "Accept-Encoding"}
+    if _not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
+
+@router.get("/search")
+def search_crop(
+    q: str = Query(..., min_length=1, description="Часть названия культуры, допускаются опечатки (maiz, wheet)"),
+    limit: int = Query(10, ge=1, le=100, description="Сколько результатов вернуть"),
+    offset: int = Query(0, ge=0, description="Сколько результатов пропустить"),
+):
+    """Ранжированный поиск культур: точное > префикс > слово > опечатка."""
+    return search_crops(q, limit=limit, offset=offset)
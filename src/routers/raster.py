@@ -0,0 +1,49 @@
+from fastapi import APIRouter, Query
+from fastapi.responses import StreamingResponse
+from services.climate_service import get_normals
+from services.ecocrop_service import ecocrop_service
+from services.raster_service import RASTER_MAX_CELLS, RasterGrid, stream_png, stream_strips
+
+router = APIRouter()
+
+
+@router.get("/suitability")
+async def suitability_raster(
+    crop: str = Query(..., description="Культура, например: Coffea arabica"),
+    bbox: str = Query(..., description="Область: запад,юг,восток,север в градусах, например 30,-5,42,5"),
+    res: float = Query(0.1, gt=0, le=10, description="Размер ячейки, °"),
+    format: str = Query("png", pattern="^(png|bin)$", description="png — картинка с палитрой, bin — сырые uint8"),
+):
+    """
+    Где в области может расти культура: растр лучшей сезонной оценки по
+    климатическим нормам (температура, осадки, широта, высота).
+
+    Ячейка — оценка 0..100 %, 255 — нет данных; строки идут с севера на юг.
+    Геопривязка — в заголовках X-Raster-*. Растр отдаётся потоком по полосам.
+    """
+    try:
+        west, south, east, north = (float(value) for value in bbox.split(","))
+    except ValueError:
+        return {"error": "bbox must be four numbers: west,south,east,north."}
+    if not (-180 <= west < east <= 180 and -90 <= south < north <= 90):
+        return {"error": "bbox must satisfy -180 <= west < east <= 180 and -90 <= south < north <= 90."}
+
+    grid = RasterGrid(west, south, east, north, res)
+    if grid.cells > RASTER_MAX_CELLS:
+        return {"error": f"Raster too large: {grid.cells} cells (limit {RASTER_MAX_CELLS}). Increase res."}
+
+    if get_normals() is None:
+        return {"error": "Climate normals are not available on this server."}
+    service = await ecocrop_service.acurrent()
+    row = service.find_row(crop)
+    if row is None:
+        return {"error": f"Crop '{crop}' not found in EcoCrop database."}
+
+    # Диапазоны одной культуры — небольшой словарь, его и получают воркеры
+    ranges = {col: values[row:row + 1].copy() for col, values in service.ranges.items()}
+    headers = {**grid.headers(), "X-Crop": service.index.scientific[row]}
+
+    strips = stream_strips(ranges, grid)
+    if format == "png":
+        return StreamingResponse(stream_png(strips, grid.width, grid.height), media_type="image/png", headers=headers)
+    return StreamingResponse(strips, media_type="application/octet-stream", headers=headers)
@@ -1,7 +1,17 @@
+import json
+import math
+import asyncio
 import logging
+import numpy as np
 from fastapi import APIRouter, Query
-from services.ecocrop_service import ecocrop_service
-from services.weather_service import get_weather
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from services.climate_service import climate_at
+from services.ecocrop_service import EcoCropService, ecocrop_service
+from services.metrics import track
+from services.responses import json_response, parse_fields, project
+from services.suitability_service import calculate_suitability, describe_factors, score_crops
+from services.weather_service import get_forecast, get_weather, normalize_city
 from datetime import datetime # sunrise, sunset
 
 # === ЛОГИРОВАНИЕ С ЦВЕТАМИ В КОНСОЛИ ===
@@ -28,21 +38,55 @@ handler.setFormatter(ColorFormatter())
 logging.basicConfig(level=logging.INFO, handlers=[handler])
 
 
+log = logging.getLogger("agro.recommend")
+
 router = APIRouter()
 
+# compact для /check: оценка и диапазоны культуры, без погоды и пояснений
+CHECK_COMPACT_FIELDS = (
+    "city", "crop", "suitable", "score", "scores",
+    *(f"crop_info.{col}" for col in EcoCropService.COMPACT_FIELDS),
+)
+
+
+def _day_length(weather: dict) -> float | None:
+    """Длина дня в часах по восходу и закату из ответа OpenWeather."""
+    sys_data = weather.get("sys", {})
+    if sys_data.get("sunrise") and sys_data.get("sunset"):
+        return (sys_data["sunset"] - sys_data["sunrise"]) / 3600
+    return None
+
+
+def _normal_rain(location: dict) -> float | None:
+    """Годовые осадки места по климатическим нормам (без сети), мм."""
+    lat, lon = location.get("lat"), location.get("lon")
+    if lat is None or lon is None:
+        return None
+    climate = climate_at(lat, lon)
+    if climate is None:
+        return None
+    return round(float(np.nansum(climate["prec"])))
+
+
 @router.get("/check")
-def check_crop_suitability(
+async def check_crop_suitability(
     city: str = Query(..., description="Название города, например: Paris"),
     crop: str = Query(..., description="Научное или обычное название культуры"),
+    rain: float | None = Query(None, ge=0, description="Годовые осадки, мм (если известны)"),
+    ph: float | None = Query(None, ge=0, le=14, description="pH почвы (если известен)"),
+    altitude: float | None = Query(None, description="Высота над уровнем моря, м (если известна)"),
+    fields: str | None = Query(None, description="Только эти поля через запятую, вложенные через точку: score,weather.main.temp"),
+    compact: bool = Query(False, description="Только оценки и диапазоны культуры"),
 ):
     """
     Проверяет, подходят ли текущие погодные условия в городе для выращивания выбранной культуры.
+    Температура, широта и длина дня берутся из OpenWeather; осадки, pH и высота — из параметров.
     """
-    weather = get_weather(city)
+    weather = await get_weather(city)
     if not weather or ("error" in weather):
         return weather if isinstance(weather, dict) else {"error": f"Unable to retrieve weather data for city '{city}'."}
 
-    crop_data = ecocrop_service.get_crop(crop)
+    crop_data = (await ecocrop_service.acurrent()).get_crop(crop)
     if not crop_data:
         return {"error": f"Crop '{crop}' not found in EcoCrop database."}
 
@@ -53,81 +97,69 @@ def check_crop_suitability(
     temp = main_data.get("temp")            # °C
     humidity = main_data.get("humidity")    # %
     # иногда ключ может быть "1h" или "3h" — берём любой доступный
-    rain = rain_data.get("1h") or 0.0 
-
-    logging.info("=== WEATHER DATA ===")
-    logging.info(f"Город: {city}")
-    logging.info(f"Погода: {weather}")
-    logging.info(f"Температура: {temp}°C, Осадки: {rain} мм, Влажность: {humidity}%")
-
-
-    # From EcoCrop
-    tmin = crop_data.get("TMIN")
-    tmax = crop_data.get("TMAX")
-    # Rain за год
-    rmin = crop_data.get("RMIN") 
+    rain_now = rain_data.get("1h") or 0.0
+    location = weather.get("location", {})
+    lat = location.get("lat")
+    lon = location.get("lon")
+    day_length = _day_length(weather)
+    if altitude is None:
+        altitude = location.get("elevation")
+
+    # Годовые осадки, если не переданы, — из климатических норм (без сети)
+    rain_source = "query" if rain is not None else None
+    if rain is None:
+        rain = _normal_rain(location)
+        if rain is not None:
+            rain_source = "climate normals"
+
+    # From EcoCrop: Rain за год
+    rmin = crop_data.get("RMIN")
     rmax = crop_data.get("RMAX")
 
-    logging.info("=== CROP DATA ===")
-    logging.info(f"Культура: {crop}")
-    logging.info(f"TMIN: {tmin}°C, TMAX: {tmax}°C")
-    logging.info(f"RMIN: {rmin} мм/год, RMAX: {rmax} мм/год")
-
-    # Проверяем соответствие
-    details = []
-
-    temp_ok = False
-    if tmin and tmax:
-        if temp < tmin:
-            details.append(f"🥶 Too cold (current {temp}°C, needs ≥ {tmin}°C)")
-        elif temp > tmax:
-            details.append(f"🔥 Too hot (current {temp}°C, needs ≤ {tmax}°C)")
-        else:
-            details.append(f"✅ Temperature is suitable ({temp}°C ∈ [{tmin}, {tmax}]°C)")
-            temp_ok = True
-
-    rain_ok = False
-    if rmin and rmax:
-        # OpenWeather gives short-term rain; we just inform about range
-        rain_ok = True  # Rain check skipped for now (needs annual data)
-        details.append(f"💧 Annual rainfall is sufficient ({rmin}–{rmax} mm).")      
-   
-   
-    """# Проверяем осадки за год NASA POWER
-    if rmin and rmax:
-        if rain < rmin:
-            details.append(f"Недостаточно осадков ({rain} мм, нужно ≥ {rmin} мм)")
-        elif rain > rmax:
-            details.append(f"Слишком много осадков ({rain} мм, нужно ≤ {rmax} мм)")
-        else:
-            details.append(f"Осадки в норме ({rain} мм ∈ [{rmin}, {rmax}] мм)")
-    """
-
-    humidity_ok = False
-    if humidity is not None:
-        if 40 <= humidity <= 90:
-            humidity_ok = True
-            details.append(f"💨 Humidity level is favorable ({humidity}%).")
-        else:
-            details.append(f"💨 Humidity level is not ideal ({humidity}%).")
-
-
-    suitable = temp_ok and rain_ok and humidity_ok
-    # logging.info(f"=== SUITABILITY RESULT: {'SUITABLE' if suitable else 'NOT SUITABLE'} ===\n {suitable}")
-
-
-    # if suitable:
-    #     summary = "✅ The weather conditions are suitable for this crop."
-    # else:
-    #     summary = "⚠️ The current conditions are not fully suitable for optimal growth."
-
+    # Проверяем соответствие по всем известным факторам
+    conditions = {
+        "temp": temp,
+        "rain": rain,
+        "ph": ph,
+        "lat": lat,
+        "altitude": altitude,
+        "day_length": day_length,
+    }
+    conditions = {k: v for k, v in conditions.items() if v is not None}
+    with track("scoring"):
+        scores = calculate_suitability(crop_data, **conditions)
+        details = describe_factors(crop_data, conditions, scores)
+
+    if rain is None and rmin and rmax:
+        # OpenWeather gives short-term rain; annual rainfall must be passed explicitly
+        details.append(f"💧 Annual rainfall needed: {rmin}–{rmax} mm (not checked, pass rain=).")
+    elif rain_source == "climate normals":
+        details.append(f"💧 Annual rainfall {rain} mm taken from long-term climate normals.")
+
+    # Пригодно, если ни один известный фактор не выходит за абсолютные границы
+    suitable = scores["total"] is not None and scores["total"] > 0
+    # Подробности — только при DEBUG: сериализация на каждый запрос не бесплатна
+    if log.isEnabledFor(logging.DEBUG):
+        log.debug(json.dumps({
+            "city": city,
+            "crop": crop,
+            "temp": temp,
+            "humidity": humidity,
+            "rain_now": rain_now,
+            "conditions": conditions,
+            "scores": scores,
+        }, ensure_ascii=False))
 
     # Общий вывод
-    return {
+    result = {
         "city": city, # weather.get("name")
+        "location": location,
         "crop": crop,
         "suitable": suitable,
+        "score": scores["total"],
+        "scores": scores,
         "details": details,
+        "rain_source": rain_source,
         # === OpenWeather Data ===
         "weather": {
             # "coord": weather.get("coord"), # lon, lat
@@ -227,3 +259,280 @@ def check_crop_suitability(
         #     "INTRI": crop_data.get("INTRI"),    # История интродукции
         # }
     }
+    # Явный список полей важнее compact
+    projection = parse_fields(fields) or (CHECK_COMPACT_FIELDS if compact else None)
+    return json_response(project(result, projection))
+
+
+@router.get("/crops")
+async def recommend_crops(
+    city: str | None = Query(None, description="Город: температура и широта берутся из OpenWeather"),
+    temp: float | None = Query(None, description="Температура, °C"),
+    rain: float | None = Query(None, ge=0, description="Годовые осадки, мм"),
+    ph: float | None = Query(None, ge=0, le=14, description="pH почвы"),
+    lat: float | None = Query(None, ge=-90, le=90, description="Широта, °"),
+    altitude: float | None = Query(None, description="Высота над уровнем моря, м"),
+    limit: int = Query(10, ge=1, le=100, description="Сколько культур вернуть"),
+):
+    """
+    Обратный запрос: какие культуры из всей базы EcoCrop лучше всего подходят
+    для условий места. Явно переданные параметры важнее данных погоды.
+    """
+    if city:
+        weather = await get_weather(city)
+        if not weather or ("error" in weather):
+            return weather if isinstance(weather, dict) else {"error": f"Unable to retrieve weather data for city '{city}'."}
+        location = weather.get("location", {})
+        if temp is None:
+            temp = weather.get("main", {}).get("temp")
+        if lat is None:
+            lat = location.get("lat")
+        if altitude is None:
+            altitude = location.get("elevation")
+        day_length = _day_length(weather)
+    else:
+        day_length = None
+
+    conditions = {
+        "temp": temp,
+        "rain": rain,
+        "ph": ph,
+        "lat": lat,
+        "altitude": altitude,
+        "day_length": day_length,
+    }
+    if all(value is None for value in conditions.values()):
+        return {"error": "Specify a city or at least one condition (temp, rain, ph, lat, altitude)."}
+    conditions = {k: v for k, v in conditions.items() if v is not None}
+
+    service = await ecocrop_service.acurrent()
+    return {
+        "city": city,
+        "conditions": conditions,
+        "crops": service.recommend(limit=limit, **conditions),
+    }
+
+
+# === ОЦЕНКА ПО ПРОГНОЗУ НА 5 ДНЕЙ ===
+
+# compact для /forecast: итог и окна риска, без разбивки по дням и шагам
+FORECAST_COMPACT_FIELDS = ("city", "crop", "ScientificName", "suitable", "score", "scores", "risks")
+
+
+@router.get("/forecast")
+async def forecast_suitability(
+    city: str = Query(..., description="Название города, например: Paris"),
+    crop: str = Query(..., description="Научное или обычное название культуры"),
+    fields: str | None = Query(None, description="Только эти поля через запятую, вложенные через точку"),
+    compact: bool = Query(False, description="Только итог и окна риска"),
+):
+    """
+    Пригодность по прогнозу OpenWeather на 5 дней с шагом 3 часа вместо
+    текущей погоды: оценка каждого шага по температурным диапазонам
+    культуры, окна риска (frost — не выше KTMP, cold — ниже TMIN,
+    heat — выше TMAX), сводка по дням и итог — средняя оценка шагов,
+    0 при угрозе гибели от заморозка. Прогноз кэшируется по месту.
+    """
+    forecast = await get_forecast(city)
+    if "error" in forecast:
+        return forecast
+
+    service = await ecocrop_service.acurrent()
+    row = service.find_row(crop)
+    if row is None:
+        return {"error": f"Crop '{crop}' not found in EcoCrop database."}
+
+    with track("scoring"):
+        outlook = service.forecast_outlook(row, forecast)
+    if "error" in outlook:
+        return outlook
+
+    result = {
+        "city": city,
+        "location": forecast["location"],
+        "crop": crop,
+        "ScientificName": service.index.scientific[row],
+        "suitable": outlook["score"] is not None and outlook["score"] > 0,
+        **outlook,
+    }
+    projection = parse_fields(fields) or (FORECAST_COMPACT_FIELDS if compact else None)
+    return json_response(project(result, projection))
+
+
+# === СЕЗОННАЯ ОЦЕНКА (КЛИМАТИЧЕСКИЕ НОРМЫ, БЕЗ СЕТИ) ===
+@router.get("/season")
+async def season_suitability(
+    lat: float = Query(..., ge=-90, le=90, description="Широта, °"),
+    lon: float = Query(..., ge=-180, le=180, description="Долгота, °"),
+    crop: str | None = Query(None, description="Культура: календарь посева по месяцам"),
+    month: int | None = Query(None, ge=1, le=12, description="Месяц посева (по умолчанию текущий)"),
+    ph: float | None = Query(None, ge=0, le=14, description="pH почвы"),
+    altitude: float | None = Query(None, description="Высота над уровнем моря, м"),
+    limit: int = Query(10, ge=1, le=100, description="Сколько культур вернуть"),
+):
+    """
+    Пригодность по многолетним климатическим нормам вместо текущей погоды.
+    С crop — оценка культуры для посева в каждом месяце года;
+    без crop — лучшие культуры для посева в месяце month.
+    """
+    climate = climate_at(lat, lon)
+    if climate is None:
+        return {"error": "No climate normals available for this location."}
+
+    conditions = {"lat": lat, "altitude": altitude, "ph": ph}
+    conditions = {k: v for k, v in conditions.items() if v is not None}
+    result = {
+        "lat": lat,
+        "lon": lon,
+        "climate": {
+            "tavg": [_round(value, 1) for value in climate["tavg"]],
+            "prec": [_round(value, 0) for value in climate["prec"]],
+        },
+    }
+
+    service = await ecocrop_service.acurrent()
+    if crop:
+        row = service.find_row(crop)
+        if row is None:
+            return {"error": f"Crop '{crop}' not found in EcoCrop database."}
+        with track("scoring"):
+            calendar = service.season_calendar(row, climate["tavg"], climate["prec"], **conditions)
+        best = max(calendar, key=lambda entry: entry["score"] if entry["score"] is not None else -1)
+        result.update({
+            "crop": crop,
+            "ScientificName": service.index.scientific[row],
+            "best_month": best["month"] if best["score"] else None,
+            "calendar": calendar,
+        })
+        return result
+
+    month = month or datetime.now().month
+    result.update({
+        "month": month,
+        "crops": service.recommend_season(climate["tavg"], climate["prec"], month, limit=limit, **conditions),
+    })
+    return result
+
+
+def _round(value, digits: int) -> float | None:
+    return None if math.isnan(value) else round(float(value), digits)
+
+
+# === ПАКЕТНАЯ ПРОВЕРКА ===
+class BatchPair(BaseModel):
+    city: str
+    crop: str
+
+
+class BatchRequest(BaseModel):
+    # Все сочетания locations × crops ...
+    locations: list[str] = []
+    crops: list[str] = []
+    # ... и/или явные пары город–культура
+    pairs: list[BatchPair] = []
+
+
+# Сколько мест оценивается одной матрицей
+BATCH_CHUNK = 64
+
+
+async def _batch_lines(request: BatchRequest):
+    """Генератор строк NDJSON: погода один раз на город, культура — один раз на название."""
+    # Группируем по нормализованному городу, сохраняя порядок; произведение
+    # locations × crops не разворачиваем, а ссылаемся на общий список культур
+    groups: dict[str, list[tuple[str, list[str]]]] = {}
+    if request.crops:
+        # Без культур оценивать нечего — погоду для таких мест не запрашиваем
+        for city in request.locations:
+            groups.setdefault(normalize_city(city), []).append((city, request.crops))
+    for pair in request.pairs:
+        groups.setdefault(normalize_city(pair.city), []).append((pair.city, [pair.crop]))
+
+    # Вся пачка считается по одной версии базы, даже если она сменится по ходу
+    service = await ecocrop_service.acurrent()
+    crop_rows = {}
+    for crop in [*request.crops, *(pair.crop for pair in request.pairs)]:
+        if crop not in crop_rows:
+            crop_rows[crop] = service.find_row(crop)
+    rows = sorted({row for row in crop_rows.values() if row is not None})
+    column = {row: i for i, row in enumerate(rows)}
+    ranges = {col: values[rows] for col, values in service.ranges.items()}
+
+    keys = list(groups)
+    for start in range(0, len(keys), BATCH_CHUNK):
+        chunk = keys[start:start + BATCH_CHUNK]
+
+        # Погода для всех мест пачки — параллельно (ограничено клиентом)
+        # Ошибка одного места не должна обрывать уже начатый поток строк
+        weathers = await asyncio.gather(*(get_weather(groups[key][0][0]) for key in chunk), return_exceptions=True)
+
+        temps, humidities, rains, lats, altitudes, day_lengths, errors = [], [], [], [], [], [], {}
+        for key, weather in zip(chunk, weathers):
+            if isinstance(weather, Exception):
+                log.error(f"Batch weather for '{groups[key][0][0]}' failed: {weather!r}")
+                errors[key] = "Unable to retrieve weather data."
+                weather = {}
+            elif not weather or ("error" in weather):
+                errors[key] = weather.get("error") if isinstance(weather, dict) else "Unable to retrieve weather data."
+                weather = {}
+            main_data = weather.get("main", {})
+            location = weather.get("location", {})
+            temps.append(main_data.get("temp", math.nan))
+            humidities.append(main_data.get("humidity", math.nan))
+            lats.append(location.get("lat", math.nan))
+            # Высота и годовые осадки — как в /check, чтобы оценки пары совпадали
+            altitude = location.get("elevation")
+            altitudes.append(math.nan if altitude is None else altitude)
+            rain = _normal_rain(location)
+            rains.append(math.nan if rain is None else rain)
+            day_length = _day_length(weather)
+            day_lengths.append(math.nan if day_length is None else day_length)
+
+        # Матрица "места пачки × культуры" одним вызовом движка
+        with track("scoring"):
+            scores = score_crops(
+                ranges,
+                temp=_column(temps),
+                rain=_column(rains),
+                lat=_column(lats),
+                altitude=_column(altitudes),
+                day_length=_column(day_lengths),
+            )
+        total = scores.pop("total")
+        scores.pop("mean")
+
+        for i, key in enumerate(chunk):
+            for city, crops in groups[key]:
+                for crop in crops:
+                    line = {"city": city, "crop": crop}
+                    row = crop_rows[crop]
+                    if key in errors:
+                        line["error"] = errors[key]
+                    elif row is None:
+                        line["error"] = f"Crop '{crop}' not found in EcoCrop database."
+                    else:
+                        j = column[row]
+                        line["ScientificName"] = service.index.scientific[row]
+                        line["temp"] = temps[i]
+                        line["humidity"] = humidities[i]
+                        line["suitability"] = _score(total[i, j])
+                        line["scores"] = {factor: _score(values[i, j]) for factor, values in scores.items()}
+                    yield json.dumps(line, ensure_ascii=False) + "\n"
+
+
+def _column(values) -> np.ndarray:
+    """Значения по местам -> столбец (L, 1) для трансляции с культурами."""
+    return np.array(values, dtype=float)[:, None]
+
+
+def _score(value) -> float | None:
+    return None if math.isnan(value) else round(float(value), 3)
+
+
+@router.post("/batch")
+async def check_batch(request: BatchRequest):
+    """
+    Пакетная проверка множества пар (место, культура).
+    Ответ — NDJSON: одна строка JSON на пару, выдаётся по мере расчёта.
+    """
+    return StreamingResponse(_batch_lines(request), media_type="application/x-ndjson")
@@ -1,9 +1,22 @@
 from fastapi import APIRouter, Query
-from services.weather_service import get_weather
+from services.weather_service import get_weather, location_resolver, weather_cache
 
 router = APIRouter()
 
 @router.get("/")
-def current_weather(city: str = Query(..., description="Название города, например: Paris")):
+async def current_weather(city: str = Query(..., description="Название города, например: Paris")):
     """Получить текущую погоду для города"""
-    return get_weather(city)
+    return await get_weather(city)
+
+@router.get("/cache")
+async def weather_cache_stats():
+    """Статистика кэша погоды: попадания, промахи, объединённые запросы"""
+    return weather_cache.stats()
+
+@router.get("/locations")
+async def search_locations(
+    q: str = Query(..., min_length=1, description="Начало названия города"),
+    limit: int = Query(10, ge=1, le=50),
+):
+    """Подсказки по уже известным местам (без запроса к OpenWeather)"""
+    return {"query": q, "locations": location_resolver.store.search(q, limit=limit), "known": location_resolver.store.stats()}
@@ -0,0 +1,89 @@
+import asyncio
+import time
+from collections import OrderedDict
+
+
+def _retrieve_exception(task: asyncio.Task):
+    # Исключение уже получили ожидающие; если все они отменены — не шумим в лог
+    if not task.cancelled():
+        task.exception()
+
+
+class TTLCache:
+    """
+    Ограниченный кэш в памяти процесса: TTL на запись + вытеснение LRU.
+
+    Загрузчик возвращает пару (значение, ttl): ttl=None — не кэшировать
+    (например, временная ошибка источника), так же задаётся короткий TTL
+    для отрицательных ответов. Одновременные промахи по одному ключу
+    объединяются — источник вызывается один раз, остальные ждут результат.
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self._data: OrderedDict = OrderedDict()  # key -> (expires_at, value)
+        self._inflight: dict[object, asyncio.Task] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    async def get_or_load(self, key, loader):
+        """Возвращает значение из кэша или ждёт loader() — один вызов на ключ."""
+        entry = self._data.get(key)
+        if entry is not None:
+            if entry[0] > time.monotonic():
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            del self._data[key]
+
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.coalesced += 1
+            # shield: отмена одного ожидающего не отменяет запрос для остальных
+            return await asyncio.shield(pending)
+
+        self.misses += 1
+        # Загрузка идёт в отдельной задаче: отмена любого из ожидающих,
+        # включая первого, не прерывает её для остальных
+        task = asyncio.get_running_loop().create_task(self._load(key, loader))
+        self._inflight[key] = task
+        task.add_done_callback(_retrieve_exception)
+        return await asyncio.shield(task)
+
+    async def _load(self, key, loader):
+        try:
+            value, ttl = await loader()
+            if ttl:
+                self._store(key, value, ttl)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    def _store(self, key, value, ttl: float):
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def __len__(self):
+        return len(self._data)
+
+    def clear(self):
+        self._data.clear()
+
+    def stats(self) -> dict:
+        """Счётчики для мониторинга."""
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else None,
+        }
@@ -0,0 +1,249 @@
+"""
+Офлайн-хранилище климатических норм: среднемесячная температура и осадки
+на регулярной сетке широта × долгота (например, WorldClim или CRU CL).
+
+Каталог CLIMATE_NORMALS_PATH (по умолчанию data/climate):
+    grid.json — {"lat0", "lon0", "step", "source"}: центр юго-западной ячейки и шаг, °
+    tavg.npy  — float32 (nlat, nlon, 12), средняя температура месяца, °C
+    prec.npy  — float32 (nlat, nlon, 12), осадки за месяц, мм
+    elev.npy  — float32 (nlat, nlon), высота над уровнем моря, м (необязательно)
+NaN — нет данных (океан). Массивы отображаются в память (mmap_mode="r"):
+12 месяцев одной ячейки лежат подряд, поэтому поиск точки читает пару
+страниц, а не весь файл, и несколько воркеров делят одни и те же страницы.
+
+Сборка из CSV с колонками lat, lon, tavg_1..tavg_12, prec_1..prec_12
+и, если есть, elev (центры ячеек, выгрузка из любой ГИС):
+
+    python -m services.climate_service --csv normals.csv --step 0.5 [--out data/climate]
+"""
+import argparse
+import json
+import logging
+import math
+import os
+import threading
+import numpy as np
+import config
+
+CLIMATE_NORMALS_PATH = getattr(config, "CLIMATE_NORMALS_PATH", "data/climate")
+
+MONTHS = 12
+
+
+class ClimateNormals:
+    """Сетка климатических норм с поиском по координатам."""
+
+    def __init__(self, tavg: np.ndarray, prec: np.ndarray, lat0: float, lon0: float, step: float,
+                 source: str = "", elev: np.ndarray | None = None):
+        # Обычный ndarray поверх тех же страниц mmap: индексация np.memmap заметно медленнее
+        self.tavg = np.asarray(tavg)
+        self.prec = np.asarray(prec)
+        self.elev = None if elev is None else np.asarray(elev)
+        self.lat0 = lat0
+        self.lon0 = lon0
+        self.step = step
+        self.source = source
+        self.nlat, self.nlon = tavg.shape[:2]
+        # Глобальная сетка замыкается по долготе: за 180° идёт -180°
+        self.wraps = abs(self.nlon * step - 360) < step / 2
+
+    def _position(self, lat, lon) -> tuple[np.ndarray, np.ndarray]:
+        """Координаты -> дробные индексы (строка, столбец) в сетке."""
+        lat = np.asarray(lat, dtype=float)
+        lon = np.asarray(lon, dtype=float)
+        lon = (lon - self.lon0 + self.step / 2) % 360 + self.lon0 - self.step / 2
+        return (lat - self.lat0) / self.step, (lon - self.lon0) / self.step
+
+    def _cells(self, rows, cols) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Индексы ячеек с учётом замыкания; valid — ячейка внутри сетки."""
+        if self.wraps:
+            cols = cols % self.nlon
+        valid = (rows >= 0) & (rows < self.nlat) & (cols >= 0) & (cols < self.nlon)
+        return np.clip(rows, 0, self.nlat - 1), np.clip(cols, 0, self.nlon - 1), valid
+
+    def nearest(self, lat, lon) -> tuple[np.ndarray, np.ndarray]:
+        """Нормы ближайшей ячейки: (tavg, prec) формы (..., 12)."""
+        y, x = self._position(lat, lon)
+        rows, cols, valid = self._cells(np.rint(y).astype(int), np.rint(x).astype(int))
+        tavg = np.where(valid[..., None], self.tavg[rows, cols], np.nan)
+        prec = np.where(valid[..., None], self.prec[rows, cols], np.nan)
+        return tavg, prec
+
+    def elevation(self, lat, lon) -> np.ndarray | None:
+        """Высота ближайшей ячейки, м (None — высот в сетке нет)."""
+        if self.elev is None:
+            return None
+        y, x = self._position(lat, lon)
+        rows, cols, valid = self._cells(np.rint(y).astype(int), np.rint(x).astype(int))
+        return np.where(valid, self.elev[rows, cols], np.nan)
+
+    def bilinear(self, lat, lon) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Билинейная интерполяция по четырём соседним ячейкам: (tavg, prec)
+        формы (..., 12). Ячейки без данных (берег) исключаются, веса
+        остальных перенормируются.
+        """
+        y, x = self._position(lat, lon)
+        y0, x0 = np.floor(y), np.floor(x)
+        fy, fx = (y - y0).astype(np.float32), (x - x0).astype(np.float32)
+        y0, x0 = y0.astype(int), x0.astype(int)
+
+        rows, cols, valid = self._cells(
+            np.stack([y0, y0, y0 + 1, y0 + 1]),
+            np.stack([x0, x0 + 1, x0, x0 + 1]),
+        )
+        weights = np.stack([(1 - fy) * (1 - fx), (1 - fy) * fx, fy * (1 - fx), fy * fx])
+
+        result = []
+        for grid in (self.tavg, self.prec):
+            values = grid[rows, cols]  # (4, ..., 12) — копия, читаются только нужные ячейки
+            usable = valid & ~np.isnan(values[..., 0])
+            w = np.where(usable, weights, np.float32(0))
+            values[~usable] = 0
+            # float32 и einsum без промежуточных (4, ..., 12): в разы быстрее на растрах
+            with np.errstate(invalid="ignore", divide="ignore"):
+                result.append(np.einsum("k...,k...m->...m", w, values) / w.sum(axis=0)[..., None])
+        return result[0], result[1]
+
+    def point(self, lat: float, lon: float, method: str = "bilinear") -> tuple[np.ndarray, np.ndarray]:
+        """
+        Быстрый путь для одной точки: индексы считаются без массивов NumPy,
+        из mmap читаются только 12 значений каждой соседней ячейки.
+        """
+        y = (lat - self.lat0) / self.step
+        x = ((lon - self.lon0 + self.step / 2) % 360 - self.step / 2) / self.step
+        if method == "nearest":
+            corners = [(round(y), round(x), 1.0)]
+        else:
+            y0, x0 = math.floor(y), math.floor(x)
+            fy, fx = y - y0, x - x0
+            corners = [
+                (y0, x0, (1 - fy) * (1 - fx)), (y0, x0 + 1, (1 - fy) * fx),
+                (y0 + 1, x0, fy * (1 - fx)), (y0 + 1, x0 + 1, fy * fx),
+            ]
+
+        result = []
+        for grid in (self.tavg, self.prec):
+            total, weight = np.zeros(MONTHS), 0.0
+            for row, col, w in corners:
+                if self.wraps:
+                    col %= self.nlon
+                if w == 0 or not (0 <= row < self.nlat and 0 <= col < self.nlon):
+                    continue
+                values = grid[row, col]
+                if values[0] == values[0]:  # не NaN
+                    total += w * values
+                    weight += w
+            result.append(total / weight if weight else np.full(MONTHS, np.nan))
+        return result[0], result[1]
+
+    def lookup(self, lat, lon, method: str = "bilinear") -> tuple[np.ndarray, np.ndarray]:
+        """Нормы для точки или массива точек; method — "bilinear" или "nearest"."""
+        if np.ndim(lat) == 0 and np.ndim(lon) == 0:
+            return self.point(float(lat), float(lon), method)
+        if method == "nearest":
+            return self.nearest(lat, lon)
+        return self.bilinear(lat, lon)
+
+    def info(self) -> dict:
+        return {
+            "source": self.source,
+            "step": self.step,
+            "lat": [self.lat0, self.lat0 + (self.nlat - 1) * self.step],
+            "lon": [self.lon0, self.lon0 + (self.nlon - 1) * self.step],
+            "cells": self.nlat * self.nlon,
+            "elevation": self.elev is not None,
+        }
+
+
+def load_normals(path: str = CLIMATE_NORMALS_PATH) -> ClimateNormals | None:
+    """Открывает сетку норм; None, если её нет."""
+    try:
+        with open(os.path.join(path, "grid.json"), encoding="utf-8") as f:
+            grid = json.load(f)
+        tavg = np.load(os.path.join(path, "tavg.npy"), mmap_mode="r")
+        prec = np.load(os.path.join(path, "prec.npy"), mmap_mode="r")
+    except FileNotFoundError:
+        return None
+    if tavg.shape != prec.shape or tavg.shape[-1] != MONTHS:
+        raise RuntimeError(f"Climate normals in {path} are inconsistent: {tavg.shape} vs {prec.shape}")
+    elev_path = os.path.join(path, "elev.npy")
+    elev = np.load(elev_path, mmap_mode="r") if os.path.exists(elev_path) else None
+    return ClimateNormals(tavg, prec, grid["lat0"], grid["lon0"], grid["step"], grid.get("source", ""), elev)
+
+
+def build_normals(csv_path: str, step: float, out_path: str = CLIMATE_NORMALS_PATH) -> str:
+    """Раскладывает точки из CSV по сетке с шагом step и сохраняет каталог норм."""
+    import pandas as pd
+
+    df = pd.read_csv(csv_path)
+    tavg_cols = [f"tavg_{m}" for m in range(1, MONTHS + 1)]
+    prec_cols = [f"prec_{m}" for m in range(1, MONTHS + 1)]
+    missing = {"lat", "lon", *tavg_cols, *prec_cols} - set(df.columns)
+    if missing:
+        raise RuntimeError(f"Columns missing in {csv_path}: {sorted(missing)}")
+
+    lat0, lon0 = float(df["lat"].min()), float(df["lon"].min())
+    rows = np.rint((df["lat"].to_numpy() - lat0) / step).astype(int)
+    cols = np.rint((df["lon"].to_numpy() - lon0) / step).astype(int)
+    shape = (rows.max() + 1, cols.max() + 1, MONTHS)
+
+    layers = [("tavg", tavg_cols, shape), ("prec", prec_cols, shape)]
+    if "elev" in df.columns:
+        layers.append(("elev", "elev", shape[:2]))
+
+    os.makedirs(out_path, exist_ok=True)
+    for name, columns, layer_shape in layers:
+        grid = np.full(layer_shape, np.nan, dtype=np.float32)
+        grid[rows, cols] = df[columns].to_numpy(dtype=np.float32)
+        # Атомарная замена, как у снимка EcoCrop: открытые mmap читают старый файл
+        tmp_path = os.path.join(out_path, f"{name}.tmp.npy")
+        np.save(tmp_path, grid)
+        os.replace(tmp_path, os.path.join(out_path, f"{name}.npy"))
+
+    with open(os.path.join(out_path, "grid.json"), "w", encoding="utf-8") as f:
+        json.dump({"lat0": lat0, "lon0": lon0, "step": step, "source": os.path.basename(csv_path)}, f)
+    return out_path
+
+
+# === ОБЩИЙ ЭКЗЕМПЛЯР ===
+_normals: ClimateNormals | None = None
+_lock = threading.Lock()
+_warned = False
+
+
+def get_normals() -> ClimateNormals | None:
+    """Сетка норм процесса (открывается при первом обращении); None — не собрана."""
+    global _normals, _warned
+    if _normals is None:
+        with _lock:
+            if _normals is None:
+                _normals = load_normals()
+            if _normals is None and not _warned:
+                _warned = True
+                logging.warning(f"Climate normals not found in {CLIMATE_NORMALS_PATH}. "
+                                f"Build them with: python -m services.climate_service --csv ... --step ...")
+    return _normals
+
+
+def climate_at(lat: float, lon: float) -> dict | None:
+    """Месячные нормы точки: {"tavg": [12], "prec": [12]} или None, если данных нет."""
+    normals = get_normals()
+    if normals is None:
+        return None
+    tavg, prec = normals.lookup(lat, lon)
+    if np.isnan(tavg).all():
+        return None
+    return {"tavg": tavg, "prec": prec}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Собрать сетку климатических норм")
+    parser.add_argument("--csv", required=True, help="CSV: lat, lon, tavg_1..tavg_12, prec_1..prec_12")
+    parser.add_argument("--step", type=float, required=True, help="шаг сетки, °")
+    parser.add_argument("--out", default=CLIMATE_NORMALS_PATH, help="каталог норм")
+    args = parser.parse_args()
+
+    path = build_normals(args.csv, args.step, args.out)
+    normals = load_normals(path)
+    print(f"Climate normals written to {path}: {normals.nlat} × {normals.nlon} cells")
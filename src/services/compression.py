@@ -0,0 +1,136 @@
+"""
+Сжатие ответов по Accept-Encoding: brotli (если установлен пакет brotli),
+иначе gzip. Сжимаются только текстовые типы (JSON, NDJSON, text/*) от
+COMPRESSION_MIN_SIZE байт; PNG и сырые растры отдаются как есть.
+Потоковые ответы сжимаются по частям со сбросом буфера после каждой —
+строки NDJSON доходят до клиента без задержки.
+"""
+import zlib
+import config
+
+try:
+    import brotli
+except ImportError:  # необязательная зависимость: без неё — только gzip
+    brotli = None
+
+COMPRESSION_MIN_SIZE = getattr(config, "COMPRESSION_MIN_SIZE", 1024)  # байт
+GZIP_LEVEL = getattr(config, "GZIP_LEVEL", 6)
+# Для динамических ответов качество 4–5 — почти как gzip -9 по размеру, но быстрее
+BROTLI_QUALITY = getattr(config, "BROTLI_QUALITY", 4)
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+
+
+def accepted_encoding(header: str) -> str | None:
+    """Лучшее поддерживаемое сжатие из заголовка Accept-Encoding."""
+    accepted = {}
+    for item in header.split(","):
+        coding, _, params = item.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding.strip().lower()] = quality
+    if brotli is not None and accepted.get("br", 0) > 0:
+        return "br"
+    if accepted.get("gzip", 0) > 0:
+        return "gzip"
+    return None
+
+
+class _Encoder:
+    def __init__(self, encoding: str):
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            self._brotli = None
+            self._zlib = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)  # 31 — формат gzip
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        if self._brotli is not None:
+            out = self._brotli.process(data)
+            return out + (self._brotli.finish() if final else self._brotli.flush())
+        out = self._zlib.compress(data)
+        return out + self._zlib.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    return _Encoder(encoding).compress(data, final=True)
+
+
+class CompressionMiddleware:
+    """ASGI-middleware сжатия; потоковые ответы не буферизуются."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        accept = next((value for name, value in scope["headers"] if name == b"accept-encoding"), b"")
+        encoding = accepted_encoding(accept.decode("latin-1"))
+
+        start = None
+        encoder = None
+
+        async def send_compressed(message):
+            nonlocal start, encoder
+            if message["type"] == "http.response.start":
+                # Заголовки отправим вместе с первой частью тела, когда станет ясен размер
+                start = message
+                return
+            if message["type"] != "http.response.body":
+                return await send(message)
+
+            body, more = message.get("body", b""), message.get("more_body", False)
+            if start is not None:
+                headers, start_message, start = start.get("headers", []), start, None
+                content_type = dict(headers).get(b"content-type", b"").decode("latin-1")
+                if (any(name == b"content-encoding" for name, _ in headers)
+                        or not content_type.startswith(COMPRESSIBLE_TYPES)):
+                    await send(start_message)
+                elif encoding is None or (not more and len(body) < COMPRESSION_MIN_SIZE):
+                    # Не сжимаем, но другому клиенту этот же ответ ушёл бы сжатым:
+                    # кэши должны различать варианты по Accept-Encoding
+                    await send({**start_message, "headers": vary_accept_encoding(headers)})
+                elif not more:
+                    # Тело целиком: сжимаем сразу и отдаём с точной длиной
+                    body = compress(body, encoding)
+                    await send({**start_message, "headers": _compressed_headers(headers, encoding, len(body))})
+                    return await send({**message, "body": body})
+                else:
+                    encoder = _Encoder(encoding)
+                    await send({**start_message, "headers": _compressed_headers(headers, encoding)})
+            if encoder is not None:
+                body = encoder.compress(body, final=not more)
+            await send({**message, "body": body})
+
+        await self.app(scope, receive, send_compressed)
+
+
+def vary_accept_encoding(headers: list) -> list:
+    """Заголовки с Accept-Encoding в Vary (без повтора, если он уже там)."""
+    vary = [value for name, value in headers if name == b"vary"]
+    if any(b"accept-encoding" in value.lower() or value.strip() == b"*" for value in vary):
+        return headers
+    result = [(name, value) for name, value in headers if name != b"vary"]
+    result.append((b"vary", b", ".join([*vary, b"Accept-Encoding"])))
+    return result
+
+
+def _compressed_headers(headers: list, encoding: str, length: int | None = None) -> list:
+    """Заголовки сжатого ответа; без length — потоковый ответ без Content-Length."""
+    result = []
+    for name, value in headers:
+        if name == b"content-length":
+            continue
+        if name == b"etag" and not value.startswith(b"W/"):
+            # Сжатое тело — другие байты: сильный ETag становится слабым
+            value = b"W/" + value
+        result.append((name, value))
+    if length is not None:
+        result.append((b"content-length", str(length).encode()))
+    result.append((b"content-encoding", encoding.encode()))
+    return vary_accept_encoding(result)
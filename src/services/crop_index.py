@@ -0,0 +1,290 @@
+import re
+from bisect import bisect_left
+import numpy as np
+
+# Примечания в скобках внутри народных названий: "neka (Simbo)", "maize (US)"
+_PARENS = re.compile(r"\s*\(.*?\)")
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_name(name: str) -> str:
+    """Приводит название к виду, в котором оно хранится в индексе."""
+    return _SPACES.sub(" ", str(name).lower()).strip()
+
+
+def split_names(value) -> list[str]:
+    """Разбивает поле COMNAME / SYNO на отдельные названия."""
+    if not isinstance(value, str):
+        return []
+    names = []
+    for part in re.split(r"[,;]", value):
+        part = normalize_name(part)
+        if not part or part == "nan":
+            continue
+        names.append(part)
+        bare = normalize_name(_PARENS.sub("", part))
+        if bare and bare != part:
+            names.append(bare)
+    return names
+
+
+def trigrams(text: str) -> set[str]:
+    """Множество триграмм строки."""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def bigrams(text: str) -> set[str]:
+    """Множество биграмм строки."""
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+def deletes(text: str) -> set[str]:
+    """Все варианты строки с одним удалённым символом."""
+    return {text[:i] + text[i + 1:] for i in range(len(text))}
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Расстояние Левенштейна; если оно больше limit — возвращает limit + 1."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i]
+        for j, cb in enumerate(b, 1):
+            cur.append(min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb)))
+        if min(cur) > limit:
+            return limit + 1
+        prev = cur
+    return min(prev[-1], limit + 1)
+
+
+class CropNameIndex:
+    """
+    Индекс названий культур, который строится один раз при загрузке базы.
+
+    - точный словарь: научное название, синонимы (SYNO) и каждое народное
+      название из COMNAME -> номер строки (для общего народного названия —
+      культура, у которой оно указано раньше в COMNAME);
+    - триграммный индекс для частичного поиска по ScientificName и COMNAME;
+    - отсортированные списки названий и слов для поиска по префиксу;
+    - индекс удалений (symmetric delete) для опечаток на 1 символ;
+    - биграммы терминов для опечаток на 2 символа: удаления глубины 2
+      по всем терминам — это ~3 млн ключей и ~1 ГБ памяти.
+    """
+
+    # Порядок групп в выдаче search(): чем меньше, тем выше
+    EXACT, PREFIX, TOKEN, FUZZY = range(4)
+    KINDS = ("exact", "prefix", "token", "fuzzy")
+
+    # Запросы короче этого не ищем с опечатками — слишком много шума
+    FUZZY_MIN_LENGTH = 4
+
+    def __init__(self, scientific: list, synonyms: list, common: list):
+        self.scientific = [normalize_name(v) if isinstance(v, str) else "" for v in scientific]
+        self.common = [normalize_name(v) if isinstance(v, str) else "" for v in common]
+
+        # При совпадении ключей побеждает научное название, затем синоним,
+        # затем народное название. Среди научных названий и синонимов — первая
+        # строка таблицы, среди народных — строка, где название стоит раньше в COMNAME.
+        self.exact: dict[str, int] = {}
+        # Для поиска нужны все строки с данным названием, а не только первая
+        self.names: dict[str, set[int]] = {}
+        for row, name in enumerate(self.scientific):
+            if name:
+                self._add_name(name, row)
+        for row, value in enumerate(synonyms):
+            for name in split_names(value):
+                self._add_name(name, row)
+                # "Hibiscus esculentus L." -> "hibiscus esculentus"
+                binomial = " ".join(name.split()[:2])
+                self._add_name(binomial, row)
+        # Народное название, общее для нескольких культур, достаётся той, у
+        # которой оно стоит раньше в списке COMNAME ("pea" — горох, а не авокадо)
+        common_rank: dict[str, tuple[int, int]] = {}
+        for row, value in enumerate(common):
+            for position, name in enumerate(split_names(value)):
+                self.names.setdefault(name, set()).add(row)
+                if name not in common_rank or (position, row) < common_rank[name]:
+                    common_rank[name] = (position, row)
+        for name, (_, row) in common_rank.items():
+            self.exact.setdefault(name, row)
+
+        self._scientific_grams = self._build_grams(self.scientific)
+        self._common_grams = self._build_grams(self.common)
+
+        # Отдельные слова названий: "coffea arabica" -> "coffea", "arabica"
+        self.tokens: dict[str, set[int]] = {}
+        for name, rows in self.names.items():
+            for token in name.split():
+                self.tokens.setdefault(token, set()).update(rows)
+
+        self._sorted_names = sorted(self.names)
+        self._sorted_tokens = sorted(self.tokens)
+
+        # Индексы опечаток строятся при первом поиске с опечатками (см. deletes_index, term_grams)
+        self._deletes: dict[str, set[str]] | None = None
+        self._term_grams: tuple[list[str], dict[str, np.ndarray]] | None = None
+
+    @property
+    def deletes_index(self) -> dict[str, set[str]]:
+        """Индекс удалений: термин и все его варианты без одного символа."""
+        if self._deletes is None:
+            index: dict[str, set[str]] = {}
+            for term in set(self.names) | set(self.tokens):
+                if len(term) < self.FUZZY_MIN_LENGTH - 1:
+                    continue
+                index.setdefault(term, set()).add(term)
+                for variant in deletes(term):
+                    index.setdefault(variant, set()).add(term)
+            # Присваиваем целиком: параллельный поиск не увидит половину индекса
+            self._deletes = index
+        return self._deletes
+
+    @property
+    def term_grams(self) -> tuple[list[str], dict[str, np.ndarray]]:
+        """Термины и для каждой биграммы — номера терминов, где она встречается."""
+        if self._term_grams is None:
+            terms = sorted(term for term in set(self.names) | set(self.tokens)
+                           if len(term) >= self.FUZZY_MIN_LENGTH - 1)
+            postings: dict[str, list[int]] = {}
+            for i, term in enumerate(terms):
+                for gram in bigrams(term):
+                    postings.setdefault(gram, []).append(i)
+            self._term_grams = (terms, {gram: np.array(ids, dtype=np.int32) for gram, ids in postings.items()})
+        return self._term_grams
+
+    def _add_name(self, name: str, row: int):
+        self.exact.setdefault(name, row)
+        self.names.setdefault(name, set()).add(row)
+
+    @staticmethod
+    def _build_grams(values: list[str]) -> dict[str, set[int]]:
+        grams: dict[str, set[int]] = {}
+        for row, value in enumerate(values):
+            for gram in trigrams(value):
+                grams.setdefault(gram, set()).add(row)
+        return grams
+
+    def lookup(self, name: str) -> int | None:
+        """
+        Возвращает номер строки культуры или None.
+
+        Сначала точное совпадение, затем — как и раньше — первая строка,
+        где ScientificName, а потом COMNAME содержит запрос как подстроку.
+        """
+        name = normalize_name(name)
+        if not name:
+            return None
+        row = self.exact.get(name)
+        if row is not None:
+            return row
+        row = self._first_containing(name, self.scientific, self._scientific_grams)
+        if row is None:
+            row = self._first_containing(name, self.common, self._common_grams)
+        return row
+
+    @staticmethod
+    def _first_containing(name: str, values: list[str], grams: dict[str, set[int]]) -> int | None:
+        if len(name) < 3:
+            # Для коротких запросов триграмм нет — обычный перебор
+            candidates = range(len(values))
+        else:
+            postings = []
+            for gram in trigrams(name):
+                rows = grams.get(gram)
+                if not rows:
+                    return None
+                postings.append(rows)
+            postings.sort(key=len)
+            candidates = sorted(postings[0].intersection(*postings[1:]))
+
+        for row in candidates:
+            if name in values[row]:
+                return row
+        return None
+
+    def search(self, query: str, limit: int = 10, offset: int = 0) -> tuple[int, list[dict]]:
+        """
+        Ранжированный поиск: exact > prefix > token > fuzzy.
+
+        Возвращает общее число найденных культур и страницу результатов
+        вида {"row", "name", "kind", "distance"}.
+        """
+        query = normalize_name(query)
+        if not query:
+            return 0, []
+
+        # row -> (группа, расстояние, длина названия, не основная строка, название)
+        best: dict[int, tuple] = {}
+
+        def offer(rows, kind, distance, term):
+            # Строка, которую вернул бы get_crop(term), идёт первой
+            primary = self.exact.get(term)
+            for row in rows:
+                rank = (kind, distance, len(term), row != primary, term)
+                current = best.get(row)
+                if current is None or rank < current:
+                    best[row] = rank
+
+        rows = self.names.get(query)
+        if rows:
+            offer(rows, self.EXACT, 0, query)
+
+        for name in self._with_prefix(self._sorted_names, query):
+            offer(self.names[name], self.PREFIX, 0, name)
+
+        # Однобуквенный запрос совпадает почти со всем — хватит префиксов
+        if len(query) > 1:
+            for token in self._with_prefix(self._sorted_tokens, query):
+                offer(self.tokens[token], self.TOKEN, 0, token)
+
+        if len(query) >= self.FUZZY_MIN_LENGTH:
+            limit_distance = 1 if len(query) < 8 else 2
+            for term, distance in self._fuzzy(query, limit_distance):
+                offer(self.names.get(term, ()), self.FUZZY, distance, term)
+                offer(self.tokens.get(term, ()), self.FUZZY, distance, term)
+
+        ordered = sorted(best.items(), key=lambda item: (item[1], self.scientific[item[0]]))
+        page = [
+            {
+                "row": row,
+                "name": rank[4],
+                "kind": self.KINDS[rank[0]],
+                "distance": rank[1],
+            }
+            for row, rank in ordered[offset:offset + limit]
+        ]
+        return len(ordered), page
+
+    @staticmethod
+    def _with_prefix(sorted_values: list[str], prefix: str) -> list[str]:
+        start = bisect_left(sorted_values, prefix)
+        end = bisect_left(sorted_values, prefix + "\uffff", start)
+        return sorted_values[start:end]
+
+    def _fuzzy(self, query: str, limit_distance: int) -> list[tuple[str, int]]:
+        # Расстояние 1: запрос или его вариант без символа есть в индексе удалений
+        index = self.deletes_index
+        candidates = set(index.get(query, ()))
+        for variant in deletes(query):
+            candidates |= index.get(variant, set())
+
+        if limit_distance >= 2:
+            # Каждая правка портит не больше двух биграмм запроса, поэтому у
+            # термина на расстоянии k общих биграмм не меньше len(grams) - 2k
+            terms, postings = self.term_grams
+            grams = bigrams(query)
+            lists = [postings[gram] for gram in grams if gram in postings]
+            if lists:
+                counts = np.bincount(np.concatenate(lists), minlength=len(terms))
+                need = max(len(grams) - 2 * limit_distance, 1)
+                for i in np.flatnonzero(counts >= need).tolist():
+                    if abs(len(terms[i]) - len(query)) <= limit_distance:
+                        candidates.add(terms[i])
+
+        found = []
+        for term in candidates:
+            distance = edit_distance(query, term, limit_distance)
+            if 0 < distance <= limit_distance:
+                found.append((term, distance))
+        return found
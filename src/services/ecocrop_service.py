@@ -1,5 +1,28 @@
-import pandas as pd
+import asyncio
+import logging
+import os
+import pprint
+import threading
+from datetime import datetime, timedelta, timezone
+from email.utils import formatdate
+import numpy as np
+import config
 from config import ECOCROP_PATH
+from services.crop_index import CropNameIndex
+from services.ecocrop_snapshot import dataset_version, fingerprint, load_table
+from services.metrics import registry, track
+from services.responses import dumps, etag, project
+from services.startup import timed
+from services.suitability_service import photoperiod_mask, risk_windows, score_crops, score_forecast, score_season
+
+log = logging.getLogger("agro.ecocrop")
+
+# Путь к бинарному снимку (по умолчанию рядом с CSV, расширение .snap)
+ECOCROP_SNAPSHOT_PATH = getattr(config, "ECOCROP_SNAPSHOT_PATH", None)
+# Как часто проверять, не сменился ли файл базы, сек (0 — не проверять)
+ECOCROP_RELOAD_INTERVAL = getattr(config, "ECOCROP_RELOAD_INTERVAL", 30)
+# Основные факторы подбора: культура с их диапазонами ранжируется выше
+PRIMARY_FACTORS = ("temperature", "rainfall")
 
 class EcoCropService:
     """Сервис для работы с базой FAO EcoCrop."""
@@ -8,51 +31,84 @@ class EcoCropService:
         "EcoPortCode",   # внутренний ID, не используется
         "SYNO",          # синонимы
         "COMNAME",       # народные названия
-        "KTMPR",         # неизвестный параметр
-        "KTMP",          # неизвестный параметр
+        "KTMPR",         # температура гибели в период покоя, не используется
         "AUTH",          # автор описания (если бы был)
-        "FAMNAME"        # семейство растения (если бы было)
+        "FAMNAME",       # семейство растения (если бы было)
+        "Unnamed: 0", "level_0", "index",  # индексы pandas в урезанных выгрузках
     }
 
-    def __init__(self):
-        # Читаем CSV
-        try:
-            self.df = pd.read_csv(ECOCROP_PATH, encoding="Windows-1252")
-        except FileNotFoundError:
-            raise RuntimeError(f"EcoCrop CSV not found at {ECOCROP_PATH}")        # Приводим все названия к нижнему регистру для ускоренного поиска
-        self.df["ScientificName"] = self.df["ScientificName"].astype(str).str.lower()
-        self.df["COMNAME"] = self.df["COMNAME"].astype(str).str.lower()
-        
-        # Заменяем NaN на None, чтобы JSON мог сериализовать
-        self.df = self.df.where(pd.notnull(self.df), None)
+    # Числовые диапазоны, которые держим отдельно в виде массивов NumPy
+    RANGE_COLUMNS = (
+        "TOPMN", "TOPMX", "TMIN", "TMAX",        # температура
+        "ROPMN", "ROPMX", "RMIN", "RMAX",        # осадки
+        "PHOPMN", "PHOPMX", "PHMIN", "PHMAX",    # pH почвы
+        "LATOPMN", "LATOPMX", "LATMN", "LATMX",  # широта
+        "ALTMX",                                 # высота
+        "GMIN", "GMAX",                          # вегетационный период, дни
+        "KTMP",                                  # температура гибели
+    )
+    # Компактная запись: названия и диапазоны, по которым идёт оценка
+    COMPACT_FIELDS = ("ScientificName", *RANGE_COLUMNS, "PHOTO")
 
+    def __init__(self, path: str = ECOCROP_PATH, source: dict | None = None):
+        self.path = path
+        # Содержимое CSV хэшируется один раз: по нему и версия, и проверка снимка
+        source = source or fingerprint(path)
+        # Версия — по содержимому файла: одинаковые данные дают одну версию
+        self.version = dataset_version(path, source)
 
-    def get_crop(self, name: str) -> dict | None:
-        """Ищет культуру по научному названию (ScientificName)."""
+        # Снимок в памяти (mmap), если он актуален, иначе — CSV
+        with timed("ecocrop.table"):
+            self.table = load_table(path, ECOCROP_SNAPSHOT_PATH, source)
+
+        # Приводим все названия к нижнему регистру для ускоренного поиска
+        self.table.map_dictionary("ScientificName", str.lower)
+        if "COMNAME" in self.table.dictionaries:
+            self.table.map_dictionary("COMNAME", str.lower)
+
+        # Индекс названий строится один раз, а не на каждый запрос
+        with timed("ecocrop.index"):
+            self.index = CropNameIndex(
+                self.table.column_values("ScientificName"),
+                self._text_column("SYNO"),
+                self._text_column("COMNAME"),
+            )
+
+        # Колоночное хранилище диапазонов для векторной оценки всех культур
+        missing = np.full(len(self.table), np.nan)
+        self.ranges = {
+            col: self.table.numeric.get(col, missing)
+            for col in self.RANGE_COLUMNS
+        }
+        # Фотопериод — битовая маска допустимых классов длины дня
+        self.ranges["PHOTO"] = photoperiod_mask(self._text_column("PHOTO"))
+
+        # Готовые ответы /crops: строка -> (JSON-байты, ETag)
+        self._payloads: dict[int, tuple[bytes, str]] = {}
+        self._records: dict[int, dict] = {}
+        # Last-Modified для всех ответов — время изменения файла базы
+        self.last_modified = formatdate(os.path.getmtime(path), usegmt=True)
+
+
+    def _text_column(self, col: str) -> list:
+        """Текстовый столбец; в урезанных версиях базы (secondtrim) его может не быть."""
+        if col in self.table.dictionaries:
+            return self.table.column_values(col)
+        return [None] * len(self.table)
+
+    def find_row(self, name: str) -> int | None:
+        """Номер строки культуры по любому названию (None — не найдена)."""
         if not name:
             return None
-        name = name.lower().strip()
-        
-        crop = self.df[self.df["ScientificName"].str.contains(name, na=False)]
-        if crop.empty:
-            crop = self.df[self.df["COMNAME"].str.contains(name, na=False)]
-            if crop.empty:
-                return None
-        # Преобразуем строку в словарь без NaN
-        data = crop.iloc[0].to_dict()
-
-        # === PPRINT ===
-        import pprint
-        print(f"\033[34m{pprint.pformat(data)}\033[0m")
-
-        # Убираем NaN вручную на случай, если где-то остались
-        clean_data = {
-            k: (None if pd.isna(v) else v)
-            for k, v in data.items()
-            if k not in self.DELETE_COLUMNS
-        }
+        with track("crop_lookup"):
+            return self.index.lookup(name)
 
-        return clean_data
+    def get_crop(self, name: str) -> dict | None:
+        """Ищет культуру по научному, синонимичному или народному названию."""
+        row = self.find_row(name)
+        if row is None:
+            return None
+        return self.crop_record(row)
         
         """ # No need
         EcoPortCode - номмер записи в базе EcoCrop
@@ -130,10 +186,335 @@ class EcoCropService:
         - GMIN / GMAX — Продолжительность вегетационного периода (в днях)
         """
 
+    def crop_record(self, row: int) -> dict:
+        """
+        Очищенная запись культуры; собирается один раз на строку.
+        Возвращается копия: вызывающий может менять её, не портя кэш.
+        """
+        clean_data = self._records.get(row)
+        if clean_data is None:
+            # Строка в виде словаря, NaN уже заменены на None
+            data = self.table.record(row)
+
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug("EcoCrop record #%d:\n%s", row, pprint.pformat(data))
+
+            clean_data = {
+                k: v
+                for k, v in data.items()
+                if k not in self.DELETE_COLUMNS
+            }
+            self._records[row] = clean_data
+        return dict(clean_data)
+
+    def crop_payload(self, row: int) -> tuple[bytes, str]:
+        """JSON-байты записи и их ETag; сериализуются один раз на строку."""
+        payload = self._payloads.get(row)
+        if payload is None:
+            body = dumps(self.crop_record(row))
+            payload = self._payloads[row] = (body, etag(body))
+        return payload
+
+    def precompute_payloads(self):
+        """Сериализует все записи заранее (при прогреве)."""
+        for row in range(len(self.table)):
+            self.crop_payload(row)
+
+    def warm_up(self):
+        """Строит все индексы, включая индекс опечаток, и готовые ответы."""
+        with timed("ecocrop.fuzzy_index"):
+            self.index.deletes_index
+            self.index.term_grams
+        with timed("ecocrop.payloads"):
+            self.precompute_payloads()
+
+    def recommend(self, limit: int = 10, **conditions) -> list[dict]:
+        """
+        Ранжирует все культуры по условиям места (temp, rain, ph, lat,
+        altitude, day_length). Оценка считается одним векторным проходом.
+        """
+        with track("scoring"):
+            return [crop for _, crop in self._rank(score_crops(self.ranges, **conditions), limit)]
+
+    def recommend_season(self, tavg, prec, start_month: int, limit: int = 10, **conditions) -> list[dict]:
+        """
+        Ранжирует культуры по климатическим нормам места (12 месяцев tavg и
+        prec) для посева в start_month; conditions — lat, altitude, ph.
+        """
+        with track("scoring"):
+            scores = score_season(self.ranges, tavg, prec, start_month, **conditions)
+            season = {key: scores.pop(key) for key in ("months", "temp_mean", "rain")}
+            return [{**crop, "season": _season_summary(season, row)} for row, crop in self._rank(scores, limit)]
+
+    def season_calendar(self, row: int, tavg, prec, **conditions) -> list[dict]:
+        """Оценка одной культуры для посева в каждом из 12 месяцев."""
+        ranges = {col: values[row:row + 1] for col, values in self.ranges.items()}
+        calendar = []
+        for month in range(1, 13):
+            scores = score_season(ranges, tavg, prec, month, **conditions)
+            season = {key: scores.pop(key) for key in ("months", "temp_mean", "rain")}
+            calendar.append({
+                "month": month,
+                "score": _rounded(scores.pop("total")[0]),
+                "factors": {factor: _rounded(values[0]) for factor, values in scores.items() if factor != "mean"},
+                "season": _season_summary(season, 0),
+            })
+        return calendar
+
+    def forecast_outlook(self, row: int, forecast: dict) -> dict:
+        """
+        Оценка одной культуры по прогнозу (столбцы из forecast_columns):
+        итог, окна риска, сводка по дням (местная дата) и оценка каждого шага.
+        """
+        dt, tz = forecast["dt"], forecast["timezone"]
+        if len(dt) == 0:
+            return {"error": "Forecast is empty."}
+        ranges = {col: values[row:row + 1] for col, values in self.ranges.items()}
+        scores = score_forecast(ranges, forecast["temp"], forecast["temp_min"], forecast["temp_max"])
+        steps = scores["temperature"][:, 0]
+        local = timezone(timedelta(seconds=tz))
+        step_seconds = int(np.median(np.diff(dt))) if len(dt) > 1 else FORECAST_STEP
+
+        def moment(ts) -> str:
+            return datetime.fromtimestamp(int(ts), local).isoformat(timespec="minutes")
+
+        # Окна риска: (вид, флаги шагов, температура для экстремума, порог культуры)
+        thresholds = {col: _rounded(values[0]) for col, values in ranges.items() if col in FORECAST_THRESHOLDS}
+        risks = []
+        for kind, temps, extreme, threshold in (
+            ("frost", forecast["temp_min"], np.min, "KTMP"),
+            ("cold", forecast["temp_min"], np.min, "TMIN"),
+            ("heat", forecast["temp_max"], np.max, "TMAX"),
+        ):
+            for first, last in risk_windows(scores[kind][:, 0]):
+                risks.append({
+                    "kind": kind,
+                    "start": moment(dt[first]),
+                    "end": moment(dt[last] + step_seconds),
+                    "hours": (last - first + 1) * step_seconds // 3600,
+                    "temp": round(float(extreme(temps[first:last + 1])), 1),
+                    "threshold": thresholds.get(threshold),
+                })
+        risks.sort(key=lambda risk: risk["start"])
+
+        # Сводка по местным суткам: шаги отсортированы, границы — смена даты
+        day = (dt + tz) // 86400
+        starts = np.flatnonzero(np.diff(day, prepend=day[0] - 1))
+        known = np.add.reduceat((~np.isnan(steps)).astype(int), starts)
+        day_scores = np.add.reduceat(np.nan_to_num(steps), starts) / np.maximum(known, 1)
+        day_min = np.minimum.reduceat(forecast["temp_min"], starts)
+        day_max = np.maximum.reduceat(forecast["temp_max"], starts)
+        flags = {kind: np.logical_or.reduceat(scores[kind][:, 0], starts) for kind in ("frost", "cold", "heat")}
+        days = [
+            {
+                "date": datetime.fromtimestamp(int(dt[start]), local).date().isoformat(),
+                "temp_min": round(float(day_min[i]), 1),
+                "temp_max": round(float(day_max[i]), 1),
+                "score": _rounded(day_scores[i]) if known[i] else None,
+                "risks": [kind for kind, values in flags.items() if values[i]],
+            }
+            for i, start in enumerate(starts)
+        ]
 
+        return {
+            "score": _rounded(scores["total"][0]),
+            "scores": {key: _rounded(scores[key][0]) for key in ("mean", "min", "optimal_share")},
+            "thresholds": thresholds,
+            "risks": risks,
+            "days": days,
+            "steps": [
+                {"time": moment(ts), "temp": _rounded(temp), "score": _rounded(score)}
+                for ts, temp, score in zip(dt, forecast["temp"], steps)
+            ],
+        }
+
+    def _rank(self, factors: dict, limit: int) -> list[tuple[int, dict]]:
+        """
+        Лучшие культуры (строка, описание): по числу известных основных
+        факторов, затем по total, mean и числу всех известных факторов.
+        """
+        total = np.nan_to_num(factors.pop("total"), nan=-1.0)
+        mean = np.nan_to_num(factors.pop("mean"), nan=-1.0)
+        if not factors:
+            return []
+
+        # Культура без диапазонов температуры и осадков не должна выходить
+        # в начало списка за счёт одной широты
+        primary = np.zeros(len(total), dtype=int)
+        for factor in PRIMARY_FACTORS:
+            if factor in factors:
+                primary += ~np.isnan(factors[factor])
+        # При равной оценке выше культура с лучшим средним и большим числом известных факторов
+        known = np.sum([~np.isnan(values) for values in factors.values()], axis=0)
+        rows = np.arange(len(total))
+        top = np.lexsort((rows, -known, -mean, -total, -primary))[:limit]
+
+        return [
+            (row, {
+                "ScientificName": self.index.scientific[row],
+                "score": round(float(total[row]), 3),
+                "factors": {factor: _rounded(values[row]) for factor, values in factors.items()},
+            })
+            for row in top
+            if total[row] >= 0
+        ]
+
+    def search(self, query: str, limit: int = 10, offset: int = 0) -> dict:
+        """Ранжированный поиск культур по названию с учётом опечаток."""
+        with track("crop_lookup"):
+            total, hits = self.index.search(query, limit=limit, offset=offset)
+        return {
+            "query": query,
+            "total": total,
+            "limit": limit,
+            "offset": offset,
+            "results": [
+                {
+                    "ScientificName": self.index.scientific[hit["row"]],
+                    "match": hit["name"],
+                    "kind": hit["kind"],
+                    "distance": hit["distance"],
+                }
+                for hit in hits
+            ],
+        }
 
-# Создаём один экземпляр, чтобы не читать CSV каждый раз
-ecocrop_service = EcoCropService()
+
+
+# Шаг прогноза OpenWeather, сек, и пороги культуры, которые с ним сравниваются
+FORECAST_STEP = 3 * 3600
+FORECAST_THRESHOLDS = ("TOPMN", "TOPMX", "TMIN", "TMAX", "KTMP")
+
+
+def _rounded(value) -> float | None:
+    return None if np.isnan(value) else round(float(value), 3)
+
+
+def _season_summary(season: dict, row: int) -> dict:
+    """Агрегаты климатических норм за вегетационный период культуры."""
+    return {
+        "months": int(season["months"][row]),
+        "temp_mean": round(float(season["temp_mean"][row]), 1),
+        "rain": round(float(season["rain"][row])),
+    }
+
+
+class LazyEcoCropService:
+    """
+    Держатель текущей версии базы. Загружается при первом обращении к
+    любому атрибуту (или заранее через warm_up() — см. lifespan в main.py),
+    а не при импорте модуля.
+
+    Новая версия (файл заменён через os.replace, или ECOCROP_PATH — симлинк,
+    который переставили на другой CSV) строится целиком в стороне и
+    подменяет старую одним присваиванием ссылки. Версии не изменяются после
+    сборки, поэтому запрос, взявший current(), до конца работает с одной
+    таблицей и её индексами, даже если в это время база сменилась.
+    """
+
+    def __init__(self, path: str = ECOCROP_PATH):
+        self.path = path
+        self._service: EcoCropService | None = None
+        self._stat = None
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._service is not None
+
+    @property
+    def version(self) -> str | None:
+        service = self._service
+        return service.version if service is not None else None
+
+    def load(self) -> EcoCropService:
+        if self._service is None:
+            with self._lock:
+                if self._service is None:
+                    # Состояние файла запоминаем до чтения: замена во время
+                    # загрузки будет замечена при следующей проверке
+                    self._stat = _file_stat(self.path)
+                    with timed("ecocrop.load"):
+                        self._service = EcoCropService(self.path)
+        return self._service
+
+    def current(self) -> EcoCropService:
+        """Текущая версия; запрос берёт её один раз и дальше работает только с ней."""
+        return self.load()
+
+    async def acurrent(self) -> EcoCropService:
+        """
+        current() для async-обработчиков: пока база строится (или её держит
+        прогрев), ждём в потоке, не блокируя event loop.
+        """
+        service = self._service
+        if service is not None:
+            return service
+        return await asyncio.to_thread(self.load)
+
+    def warm_up(self):
+        """Загружает базу и строит все индексы, включая индекс опечаток."""
+        self.load().warm_up()
+
+    def reload(self, path: str | None = None) -> bool:
+        """
+        Собирает базу заново (из path или текущего файла) и подменяет
+        текущую версию. True — если версия сменилась; при ошибке сборки
+        остаётся старая.
+        """
+        with self._reload_lock:
+            path = path or self.path
+            stat = _file_stat(path)
+            try:
+                source = fingerprint(path)
+                if path == self.path and dataset_version(path, source) == self.version:
+                    # Файл тронут, но содержимое то же — пересобирать нечего
+                    self._stat = stat
+                    return False
+                service = EcoCropService(path, source)
+                service.warm_up()
+            except Exception:
+                log.exception(f"EcoCrop reload from {path} failed, keeping version {self.version}")
+                self._stat = stat
+                return False
+
+            previous = self.version
+            self._service = service
+            self.path, self._stat = path, stat
+            log.info(f"EcoCrop dataset {previous} -> {service.version} ({path}, {len(service.table)} crops)")
+            return service.version != previous
+
+    def reload_if_changed(self) -> bool:
+        """Проверка для периодического опроса: дешёвый stat(), сборка — только если файл сменился."""
+        if self._service is None:
+            return False
+        stat = _file_stat(self.path)
+        if stat is None or stat == self._stat:
+            return False
+        return self.reload()
+
+    def __getattr__(self, name):
+        return getattr(self.load(), name)
+
+
+def _file_stat(path: str) -> tuple | None:
+    """Признаки смены файла: inode (замена через os.replace), размер, время."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+# Один экземпляр на процесс; CSV/снимок читается при первом обращении
+ecocrop_service = LazyEcoCropService()
+
+
+@registry.collect("agro_ecocrop_dataset_info", "Active EcoCrop dataset version.", ("version",))
+def _dataset_info():
+    version = ecocrop_service.version
+    return {(version,): 1} if version is not None else {}
 
 
 def get_crop(name: str):
@@ -141,3 +522,52 @@ def get_crop(name: str):
     return ecocrop_service.get_crop(name)
 
 
+def get_crop_payload(name: str, fields: tuple[str, ...] | None = None) -> tuple[bytes, str, str] | None:
+    """
+    Фасад для /crops: JSON-байты, ETag и Last-Modified. Полная запись
+    берётся готовой, выборка полей сериализуется на каждый запрос.
+    """
+    service = ecocrop_service.current()
+    row = service.find_row(name)
+    if row is None:
+        return None
+    if fields is None:
+        body, tag = service.crop_payload(row)
+    else:
+        body = dumps(project(service.crop_record(row), fields))
+        tag = etag(body)
+    return body, tag, service.last_modified
+
+
+def search_crops(query: str, limit: int = 10, offset: int = 0):
+    """Фасад поиска для вызова из FastAPI."""
+    return ecocrop_service.search(query, limit=limit, offset=offset)
+
+
+# === ВЕРСИЯ БАЗЫ В ОТВЕТАХ ===
+
+class DatasetVersionMiddleware:
+    """
+    Заголовок X-Dataset-Version во всех ответах, пока база загружена, —
+    для ключей кэша на клиентах и прокси: после смены версии ответы
+    /crops и /recommend могут измениться.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        async def send_with_version(message):
+            if message["type"] == "http.response.start":
+                version = ecocrop_service.version
+                if version is not None:
+                    message["headers"] = [*message.get("headers", []), (b"x-dataset-version", version.encode())]
+            await send(message)
+
+        await self.app(scope, receive, send_with_version)
+
+
+
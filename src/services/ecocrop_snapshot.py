@@ -0,0 +1,219 @@
+"""
+Бинарный снимок базы EcoCrop для быстрого старта.
+
+CSV разбирается один раз командой
+
+    python -m services.ecocrop_snapshot [--csv data/EcoCrop_DB.csv] [--out data/EcoCrop_DB.snap]
+
+Числовые столбцы хранятся как массивы float64/int64 фиксированной ширины,
+текстовые — кодами int16/int32 и словарём уникальных значений. При старте
+файл отображается в память (mmap), поэтому несколько воркеров делят одни
+и те же страницы, а pandas не нужен вовсе. Если CSV изменился (другой
+размер или SHA-256), снимок считается устаревшим и читается CSV.
+
+Формат: MAGIC | uint64 длина заголовка | JSON-заголовок | выровненные массивы.
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import numpy as np
+
+MAGIC = b"ECOSNAP1"
+ALIGN = 8
+
+
+class EcoCropTable:
+    """Колоночная таблица EcoCrop: числовые массивы + закодированные строки."""
+
+    def __init__(self, columns: list[str], numeric: dict, codes: dict, dictionaries: dict):
+        self.columns = columns
+        self.numeric = numeric            # столбец -> np.ndarray (NaN = нет данных)
+        self.codes = codes                # столбец -> np.ndarray кодов (-1 = нет данных)
+        self.dictionaries = dictionaries  # столбец -> список уникальных значений
+        self.rows = len(next(iter(numeric.values()))) if numeric else len(next(iter(codes.values())))
+
+    def __len__(self):
+        return self.rows
+
+    def column_values(self, col: str) -> list:
+        """Все значения текстового столбца по строкам (None — нет данных)."""
+        dictionary = self.dictionaries[col]
+        return [dictionary[code] if code >= 0 else None for code in self.codes[col].tolist()]
+
+    def map_dictionary(self, col: str, func):
+        """Преобразует значения текстового столбца через словарь, не трогая коды."""
+        self.dictionaries[col] = [func(value) for value in self.dictionaries[col]]
+
+    def record(self, row: int) -> dict:
+        """Строка таблицы в виде словаря; NaN заменяется на None."""
+        data = {}
+        for col in self.columns:
+            if col in self.numeric:
+                value = self.numeric[col][row].item()
+                data[col] = None if value != value else value
+            else:
+                code = int(self.codes[col][row])
+                data[col] = self.dictionaries[col][code] if code >= 0 else None
+        return data
+
+    @classmethod
+    def from_dataframe(cls, df) -> "EcoCropTable":
+        numeric, codes, dictionaries = {}, {}, {}
+        for col in df.columns:
+            series = df[col]
+            if series.dtype.kind in "if":
+                numeric[col] = series.to_numpy(dtype=np.int64 if series.dtype.kind == "i" else np.float64)
+            else:
+                values = [v if isinstance(v, str) else None for v in series.tolist()]
+                dictionary = sorted({v for v in values if v is not None})
+                position = {v: i for i, v in enumerate(dictionary)}
+                dtype = np.int16 if len(dictionary) < np.iinfo(np.int16).max else np.int32
+                codes[col] = np.array([position[v] if v is not None else -1 for v in values], dtype=dtype)
+                dictionaries[col] = dictionary
+        return cls(list(df.columns), numeric, codes, dictionaries)
+
+
+def default_snapshot_path(csv_path: str) -> str:
+    return os.path.splitext(csv_path)[0] + ".snap"
+
+
+def fingerprint(csv_path: str) -> dict:
+    """
+    Размер и SHA-256 содержимого CSV. Читает весь файл, поэтому при
+    загрузке считается один раз и передаётся дальше (source=).
+    """
+    with open(csv_path, "rb") as f:
+        content = f.read()
+    return {"size": len(content), "sha256": hashlib.sha256(content).hexdigest()}
+
+
+def dataset_version(csv_path: str, source: dict | None = None) -> str:
+    """Версия набора данных — начало SHA-256 содержимого CSV."""
+    return (source or fingerprint(csv_path))["sha256"][:12]
+
+
+def read_csv_table(csv_path: str) -> EcoCropTable:
+    """Медленный путь: разбор CSV через pandas."""
+    import pandas as pd
+
+    try:
+        df = pd.read_csv(csv_path, encoding="Windows-1252")
+    except FileNotFoundError:
+        raise RuntimeError(f"EcoCrop CSV not found at {csv_path}")
+    return EcoCropTable.from_dataframe(df)
+
+
+def build_snapshot(csv_path: str, snapshot_path: str | None = None) -> str:
+    """Компилирует CSV в бинарный снимок и возвращает путь к нему."""
+    snapshot_path = snapshot_path or default_snapshot_path(csv_path)
+    table = read_csv_table(csv_path)
+
+    arrays = {f"numeric:{col}": values for col, values in table.numeric.items()}
+    arrays.update({f"codes:{col}": values for col, values in table.codes.items()})
+
+    # Смещения считаются от начала области данных
+    layout, offset = {}, 0
+    for name, values in arrays.items():
+        layout[name] = {"dtype": values.dtype.str, "offset": offset, "count": len(values)}
+        offset += -(-values.nbytes // ALIGN) * ALIGN
+
+    header = json.dumps({
+        "source": fingerprint(csv_path),
+        "rows": len(table),
+        "columns": table.columns,
+        "arrays": layout,
+        "dictionaries": table.dictionaries,
+    }, ensure_ascii=False).encode("utf-8")
+    data_start = -(-(len(MAGIC) + 8 + len(header)) // ALIGN) * ALIGN
+
+    tmp_path = snapshot_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(np.uint64(len(header)).tobytes())
+        f.write(header)
+        for name, values in arrays.items():
+            f.seek(data_start + layout[name]["offset"])
+            f.write(np.ascontiguousarray(values).tobytes())
+        f.truncate(data_start + offset)
+    # Атомарная замена: работающие воркеры продолжают читать старый файл
+    os.replace(tmp_path, snapshot_path)
+    return snapshot_path
+
+
+def _parse_snapshot(buffer: np.memmap, csv_path: str | None, source: dict | None) -> EcoCropTable | None:
+    """Разбор отображённого снимка; ValueError/KeyError/TypeError — файл повреждён."""
+    prefix = len(MAGIC) + 8
+    if len(buffer) < prefix or bytes(buffer[:len(MAGIC)]) != MAGIC:
+        return None
+
+    header_end = prefix + int(buffer[len(MAGIC):prefix].view(np.uint64)[0])
+    if header_end > len(buffer):
+        raise ValueError("header is truncated")
+    header = json.loads(bytes(buffer[prefix:header_end]).decode("utf-8"))
+
+    if source is None and csv_path is not None and os.path.exists(csv_path):
+        source = fingerprint(csv_path)
+    if source is not None and header["source"] != source:
+        return None
+
+    rows = header["rows"]
+    data_start = -(-header_end // ALIGN) * ALIGN
+    numeric, codes = {}, {}
+    for name, spec in header["arrays"].items():
+        dtype = np.dtype(spec["dtype"])
+        start = data_start + spec["offset"]
+        end = start + dtype.itemsize * spec["count"]
+        # Обрезанный файл или чужой заголовок: массив должен целиком лежать
+        # в файле и содержать по значению на каждую строку
+        if spec["count"] != rows or start < data_start or end > len(buffer):
+            raise ValueError(f"array {name} is out of bounds")
+        kind, col = name.split(":", 1)
+        (numeric if kind == "numeric" else codes)[col] = buffer[start:end].view(dtype)
+
+    columns = header["columns"]
+    if set(columns) != numeric.keys() | codes.keys():
+        raise ValueError("columns do not match arrays")
+    return EcoCropTable(columns, numeric, codes, header["dictionaries"])
+
+
+def load_snapshot(snapshot_path: str, csv_path: str | None = None, source: dict | None = None) -> EcoCropTable | None:
+    """
+    Отображает снимок в память. Возвращает None, если снимка нет, он
+    повреждён или (при переданном csv_path) построен по другому CSV;
+    source — уже посчитанный fingerprint(csv_path), чтобы не читать CSV снова.
+    """
+    try:
+        buffer = np.memmap(snapshot_path, dtype=np.uint8, mode="r")
+    except (FileNotFoundError, ValueError):
+        return None
+    try:
+        return _parse_snapshot(buffer, csv_path, source)
+    except (ValueError, KeyError, TypeError, AttributeError):
+        # В том числе UnicodeDecodeError и JSONDecodeError (подклассы ValueError)
+        return None
+
+
+def load_table(csv_path: str, snapshot_path: str | None = None, source: dict | None = None) -> EcoCropTable:
+    """Снимок, если он актуален, иначе — CSV."""
+    snapshot_path = snapshot_path or default_snapshot_path(csv_path)
+    table = load_snapshot(snapshot_path, csv_path, source)
+    if table is None:
+        if os.path.exists(snapshot_path):
+            logging.warning(f"EcoCrop snapshot {snapshot_path} is stale or damaged, reading CSV. "
+                            f"Rebuild it with: python -m services.ecocrop_snapshot")
+        table = read_csv_table(csv_path)
+    return table
+
+
+if __name__ == "__main__":
+    from config import ECOCROP_PATH
+
+    parser = argparse.ArgumentParser(description="Собрать бинарный снимок базы EcoCrop")
+    parser.add_argument("--csv", default=ECOCROP_PATH, help="исходный CSV")
+    parser.add_argument("--out", default=None, help="путь к снимку (по умолчанию рядом с CSV, .snap)")
+    args = parser.parse_args()
+
+    path = build_snapshot(args.csv, args.out)
+    print(f"EcoCrop snapshot written to {path} ({os.path.getsize(path)} bytes)")
@@ -0,0 +1,206 @@
+"""
+Локальный справочник мест: город -> (lat, lon, страна, высота).
+
+Каждый свободный запрос ("Paris ", "paris,fr") нормализуется и
+запоминается как псевдоним места, поэтому геокодер OpenWeather
+вызывается один раз на новое написание, а не на каждый запрос. Запрос
+"город,страна" сначала ищется среди уже известных мест — так "Paris,FR"
+находит место, ранее сохранённое по запросу "paris".
+
+Места и псевдонимы хранятся в SQLite (LOCATIONS_PATH) и целиком
+держатся в памяти; имена — в отсортированном списке для поиска по префиксу.
+"""
+import asyncio
+import bisect
+import logging
+import re
+import sqlite3
+import threading
+import httpx
+import config
+from services.cache import TTLCache
+from services.climate_service import get_normals
+
+LOCATIONS_PATH = getattr(config, "LOCATIONS_PATH", "data/locations.sqlite")
+GEOCODING_URL = getattr(config, "GEOCODING_URL", "http://api.openweathermap.org/geo/1.0")
+LOCATION_NEGATIVE_TTL = getattr(config, "LOCATION_NEGATIVE_TTL", 3600)  # сек, для ненайденных мест
+
+
+def normalize_city(city: str) -> str:
+    """Ключ: "Paris , FR " и "paris,fr" — один и тот же запрос."""
+    city = re.sub(r"\s+", " ", city.lower()).strip()
+    return re.sub(r"\s*,\s*", ",", city)
+
+
+class LocationStore:
+    """Места и псевдонимы запросов: SQLite на диске + словари в памяти."""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS locations (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            state TEXT,
+            country TEXT,
+            lat REAL NOT NULL,
+            lon REAL NOT NULL,
+            elevation REAL,
+            UNIQUE (name, state, country)
+        );
+        CREATE TABLE IF NOT EXISTS aliases (
+            alias TEXT PRIMARY KEY,
+            location_id INTEGER NOT NULL REFERENCES locations (id)
+        );
+    """
+
+    def __init__(self, path: str = LOCATIONS_PATH):
+        self.path = path
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(self.SCHEMA)
+        self._lock = threading.Lock()
+
+        self.locations: dict[int, dict] = {}
+        self.aliases: dict[str, int] = {}
+        self._names: list[tuple[str, int]] = []  # (имя в нижнем регистре, id), отсортирован
+
+        for row in self._db.execute("SELECT id, name, state, country, lat, lon, elevation FROM locations"):
+            self._remember(*row)
+        self.aliases.update(self._db.execute("SELECT alias, location_id FROM aliases"))
+
+    def _remember(self, location_id, name, state, country, lat, lon, elevation) -> dict:
+        location = {"name": name, "state": state, "country": country, "lat": lat, "lon": lon, "elevation": elevation}
+        self.locations[location_id] = location
+        bisect.insort(self._names, (name.lower(), location_id))
+        return location
+
+    def get(self, alias: str) -> dict | None:
+        location_id = self.aliases.get(alias)
+        return None if location_id is None else self.locations[location_id]
+
+    def match(self, query: str) -> dict | None:
+        """Известное место по запросу "город,страна" или "город,регион,страна"."""
+        parts = query.split(",")
+        if len(parts) < 2:
+            return None
+        name, country = parts[0], parts[-1]
+        state = parts[1] if len(parts) == 3 else None
+        for location_id in self._ids_with_prefix(name):
+            location = self.locations[location_id]
+            if location["name"].lower() != name or (location["country"] or "").lower() != country:
+                continue
+            if state is None or (location["state"] or "").lower() == state:
+                return location
+        return None
+
+    def add(self, alias: str, location: dict) -> dict:
+        """Сохраняет место (если оно новое) и псевдоним запроса; возвращает место из справочника."""
+        with self._lock, self._db:
+            row = self._db.execute(
+                "SELECT id FROM locations WHERE name = ? AND state IS ? AND country IS ?",
+                (location["name"], location["state"], location["country"]),
+            ).fetchone()
+            if row is None:
+                cursor = self._db.execute(
+                    "INSERT INTO locations (name, state, country, lat, lon, elevation) VALUES (?, ?, ?, ?, ?, ?)",
+                    (location["name"], location["state"], location["country"],
+                     location["lat"], location["lon"], location["elevation"]),
+                )
+                location_id = cursor.lastrowid
+                self._remember(location_id, location["name"], location["state"], location["country"],
+                               location["lat"], location["lon"], location["elevation"])
+            else:
+                location_id = row[0]
+            self._db.execute("INSERT OR REPLACE INTO aliases (alias, location_id) VALUES (?, ?)", (alias, location_id))
+            self.aliases[alias] = location_id
+        return self.locations[location_id]
+
+    def _ids_with_prefix(self, prefix: str) -> list[int]:
+        start = bisect.bisect_left(self._names, (prefix,))
+        ids = []
+        for name, location_id in self._names[start:]:
+            if not name.startswith(prefix):
+                break
+            ids.append(location_id)
+        return ids
+
+    def search(self, prefix: str, limit: int = 10) -> list[dict]:
+        """Известные места, чьё название начинается с prefix."""
+        prefix = normalize_city(prefix).split(",")[0]
+        if not prefix:
+            return []
+        return [self.locations[location_id] for location_id in self._ids_with_prefix(prefix)[:limit]]
+
+    def stats(self) -> dict:
+        return {"locations": len(self.locations), "aliases": len(self.aliases)}
+
+
+class LocationResolver:
+    """
+    Запрос -> место: псевдоним в справочнике, затем известное место по
+    "город,страна", затем геокодер OpenWeather. Одновременные запросы одного
+    нового места объединяются, ненайденные места кэшируются на время.
+    """
+
+    def __init__(self, client, store_path: str = LOCATIONS_PATH, geocoding_url: str = GEOCODING_URL):
+        self.client = client
+        self.store_path = store_path
+        self.geocoding_url = geocoding_url
+        self.cache = TTLCache(maxsize=1024)
+        self._store: LocationStore | None = None
+
+    @property
+    def store(self) -> LocationStore:
+        # Открываем при первом обращении, а не при импорте
+        if self._store is None:
+            self._store = LocationStore(self.store_path)
+        return self._store
+
+    async def resolve(self, city: str) -> dict:
+        """Место для запроса или {"error": ...}."""
+        key = normalize_city(city)
+        store = self._store
+        if store is None:
+            # Первое открытие читает весь справочник с диска
+            store = await asyncio.to_thread(lambda: self.store)
+        location = store.get(key)
+        if location is not None:
+            return location
+        return await self.cache.get_or_load(key, lambda: self._lookup(city, key))
+
+    async def _lookup(self, city: str, key: str) -> tuple[dict, float | None]:
+        location = self.store.match(key)
+        if location is not None:
+            return await self._save(key, location), None
+
+        try:
+            response = await self.client.get(f"{self.geocoding_url}/direct", upstream="geocoding", q=city, limit=1)
+            response.raise_for_status()
+            found = response.json()
+        except httpx.HTTPError as e:
+            logging.error(f"Error requesting OpenWeather geocoding: {e!r}")
+            return {"error": "Failed to resolve the location. Please try again later."}, None
+
+        if not found:
+            return {"error": f"You entered an invalid city: '{city}'."}, LOCATION_NEGATIVE_TTL
+        place = found[0]
+        location = {
+            "name": place["name"],
+            "state": place.get("state"),
+            "country": place.get("country"),
+            "lat": round(place["lat"], 4),
+            "lon": round(place["lon"], 4),
+            "elevation": _elevation(place["lat"], place["lon"]),
+        }
+        return await self._save(key, location), None
+
+    async def _save(self, key: str, location: dict) -> dict:
+        # INSERT и commit SQLite — в потоке, чтобы не держать event loop
+        return await asyncio.to_thread(self.store.add, key, location)
+
+
+def _elevation(lat: float, lon: float) -> float | None:
+    """Высота по сетке климатических норм, если в ней есть высоты."""
+    normals = get_normals()
+    elevation = normals.elevation(lat, lon) if normals is not None else None
+    if elevation is None or elevation != elevation:
+        return None
+    return round(float(elevation))
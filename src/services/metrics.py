@@ -0,0 +1,226 @@
+"""
+Метрики процесса в формате Prometheus (text exposition 0.0.4) без
+внешних зависимостей: счётчики, гистограммы и значения, которые
+собираются в момент запроса /metrics (статистика кэшей).
+
+    with track("weather"):      # длительность этапа обработки запроса
+        ...
+    upstream_errors.inc(upstream="openweather", kind="timeout")
+
+MetricsMiddleware замеряет каждый HTTP-запрос по шаблону маршрута и
+пишет структурированную строку журнала — для доли запросов
+(REQUEST_LOG_SAMPLE), а также для всех ошибок и медленных запросов.
+"""
+import bisect
+import json
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+import config
+
+REQUEST_LOG_SAMPLE = getattr(config, "REQUEST_LOG_SAMPLE", 0.01)    # доля запросов в журнале
+REQUEST_LOG_SLOW_MS = getattr(config, "REQUEST_LOG_SLOW_MS", 1000)  # медленные пишутся всегда
+
+# Границы корзин гистограмм, сек: от 0.1 мс до 10 с
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+                   0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+request_log = logging.getLogger("agro.requests")
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        self.name, self.help, self.labels = name, help, labels
+        self._values: dict[tuple, float] = {}
+        # Метрики пишут и синхронные обработчики из пула потоков
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(labels[name] for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = list(self._values.items())
+        for key, value in values:
+            lines.append(f"{self.name}{_labels(self.labels, key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name, self.help, self.labels, self.buckets = name, help, labels, buckets
+        # метки -> [счётчики по корзинам (последняя — +Inf), сумма]
+        self._series: dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels[name] for name in self.labels)
+        bucket = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][bucket] += 1
+            series[1] += value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            # Копия под замком: сумма и корзины одного ряда согласованы
+            series = [(key, list(counts), total) for key, (counts, total) in self._series.items()]
+        for key, counts, total in series:
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                le = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labels, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, key)} {round(total, 6)}")
+            lines.append(f"{self.name}_count{_labels(self.labels, key)} {cumulative}")
+        return lines
+
+
+class Collected:
+    """Значения читаются функцией collect() в момент запроса /metrics."""
+
+    def __init__(self, name: str, help: str, labels: tuple, collect, kind: str = "gauge"):
+        self.name, self.help, self.labels, self.collect, self.kind = name, help, labels, collect, kind
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for key, value in self.collect().items():
+            if value is not None:
+                lines.append(f"{self.name}{_labels(self.labels, key)} {value}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def counter(self, *args, **kwargs) -> Counter:
+        metric = Counter(*args, **kwargs)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, *args, **kwargs) -> Histogram:
+        metric = Histogram(*args, **kwargs)
+        self.metrics.append(metric)
+        return metric
+
+    def collect(self, name: str, help: str, labels: tuple = (), kind: str = "gauge"):
+        """
+        Декоратор для значений, которые уже считаются где-то ещё (например,
+        счётчики кэша): функция возвращает {значения меток: значение}.
+        """
+        def register(collect):
+            self.metrics.append(Collected(name, help, labels, collect, kind))
+            return collect
+        return register
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+request_seconds = registry.histogram(
+    "agro_http_request_duration_seconds", "HTTP request latency by route template.", ("method", "route", "status"))
+stage_seconds = registry.histogram(
+    "agro_stage_duration_seconds", "Time spent in a request stage (weather, crop_lookup, scoring, ...).", ("stage",))
+upstream_seconds = registry.histogram(
+    "agro_upstream_duration_seconds", "Latency of upstream HTTP calls, retries included.", ("upstream",))
+upstream_errors = registry.counter(
+    "agro_upstream_errors_total", "Failed upstream attempts by kind (status code or exception).", ("upstream", "kind"))
+
+
+@contextmanager
+def track(stage: str):
+    """Замеряет этап обработки запроса."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stage_seconds.observe(time.perf_counter() - start, stage=stage)
+
+
+# === MIDDLEWARE ===
+
+class MetricsMiddleware:
+    """
+    ASGI-middleware (без BaseHTTPMiddleware — не буферизует потоковые
+    ответы): длительность запроса до последнего байта тела, по шаблону
+    маршрута, а не по пути — иначе число рядов метрики неограниченно.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            template = _route_template(scope)
+            request_seconds.observe(elapsed, method=scope["method"], route=template, status=status)
+            _log_request(scope, template, status, elapsed)
+
+
+def _route_template(scope) -> str:
+    """Шаблон маршрута ("/recommend/check", "/crops/")."""
+    # Обычно include_router копирует маршрут с prefix, и route.path — полный
+    # шаблон. Новые FastAPI маршрут не копируют: route.path остаётся
+    # относительным, а полный шаблон лежит в контексте подключённого роутера
+    context = scope.get("fastapi", {}).get("effective_route_context")
+    route = context if context is not None else scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+def _log_request(scope, route: str, status: int, elapsed: float):
+    """Одна JSON-строка на запрос: ошибки и медленные — всегда, остальные — выборочно."""
+    ms = elapsed * 1000
+    if status >= 500 or ms >= REQUEST_LOG_SLOW_MS:
+        level = logging.WARNING
+    elif random.random() < REQUEST_LOG_SAMPLE:
+        level = logging.INFO
+    else:
+        return
+    if not request_log.isEnabledFor(level):
+        return
+    request_log.log(level, json.dumps({
+        "method": scope["method"],
+        "route": route,
+        "path": scope["path"],
+        "status": status,
+        "ms": round(ms, 2),
+    }))
@@ -0,0 +1,167 @@
+"""
+Растр пригодности: оценка одной культуры в каждой ячейке области.
+
+Область делится на горизонтальные полосы не больше RASTER_TILE_CELLS ячеек.
+Каждая полоса считается в пуле процессов (климатические нормы каждый
+воркер открывает через mmap сам — страницы общие), результат отдаётся
+по мере готовности, порядок полос сохраняется. Промежуточных таблиц на
+весь растр нет: в памяти одновременно лишь несколько полос.
+
+Значение ячейки — uint8: оценка 0..100 (%), NODATA — нет климатических данных.
+"""
+import asyncio
+import math
+import multiprocessing
+import os
+import struct
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import config
+from services.climate_service import get_normals
+from services.suitability_service import best_season
+
+RASTER_WORKERS = getattr(config, "RASTER_WORKERS", os.cpu_count() or 1)
+RASTER_TILE_CELLS = getattr(config, "RASTER_TILE_CELLS", 65536)    # ячеек в одной полосе
+RASTER_MAX_CELLS = getattr(config, "RASTER_MAX_CELLS", 4_000_000)  # ограничение на запрос
+
+NODATA = 255
+
+
+# === РАСЧЁТ ПОЛОСЫ (выполняется в воркере) ===
+
+def render_strip(ranges: dict, west: float, north: float, res: float, width: int, row0: int, rows: int) -> bytes:
+    """Строки row0..row0+rows растра (с севера на юг) в виде байтов uint8."""
+    normals = get_normals()
+    lat = north - (row0 + np.arange(rows) + 0.5) * res
+    lon = west + (np.arange(width) + 0.5) * res
+    lat, lon = np.repeat(lat, width), np.tile(lon, rows)
+
+    tavg, prec = normals.lookup(lat, lon)
+    score, _ = best_season(ranges, tavg, prec, lat=lat, altitude=normals.elevation(lat, lon))
+    values = np.where(np.isnan(score), NODATA, np.rint(np.nan_to_num(score) * 100))
+    return values.astype(np.uint8).tobytes()
+
+
+def _init_worker():
+    # Открываем нормы заранее, чтобы первая полоса не платила за это
+    get_normals()
+
+
+_pool: ProcessPoolExecutor | None = None
+
+
+def get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # spawn: fork процесса с работающим event loop и потоками небезопасен
+        _pool = ProcessPoolExecutor(
+            max_workers=RASTER_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+        )
+    return _pool
+
+
+def shutdown_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+# === СЕТКА И ПОТОК ПОЛОС ===
+
+class RasterGrid:
+    """Геопривязка растра: bbox (запад, юг, восток, север), шаг в градусах."""
+
+    def __init__(self, west: float, south: float, east: float, north: float, res: float):
+        self.west, self.south, self.east, self.north = west, south, east, north
+        self.res = res
+        self.width = max(1, math.ceil((east - west) / res - 1e-9))
+        self.height = max(1, math.ceil((north - south) / res - 1e-9))
+
+    @property
+    def cells(self) -> int:
+        return self.width * self.height
+
+    def strips(self) -> list[tuple[int, int]]:
+        """Полосы (первая строка, число строк) не больше RASTER_TILE_CELLS ячеек."""
+        rows = max(1, RASTER_TILE_CELLS // self.width)
+        return [(row0, min(rows, self.height - row0)) for row0 in range(0, self.height, rows)]
+
+    def headers(self) -> dict:
+        """Геопривязка для заголовков ответа."""
+        return {
+            "X-Raster-Width": str(self.width),
+            "X-Raster-Height": str(self.height),
+            "X-Raster-Bbox": f"{self.west},{self.north - self.height * self.res},"
+                             f"{self.west + self.width * self.res},{self.north}",
+            "X-Raster-Resolution": str(self.res),
+            "X-Raster-Nodata": str(NODATA),
+            "X-Raster-Scale": "0.01",
+        }
+
+
+async def stream_strips(ranges: dict, grid: RasterGrid):
+    """
+    Асинхронный генератор байтов полос по порядку. Одновременно в работе
+    не больше 2 × RASTER_WORKERS полос; маленький растр считается в потоке.
+    """
+    loop = asyncio.get_running_loop()
+    strips = grid.strips()
+    if len(strips) == 1:
+        yield await asyncio.to_thread(render_strip, ranges, grid.west, grid.north, grid.res, grid.width, *strips[0])
+        return
+
+    pool = get_pool()
+    pending = []
+    try:
+        for strip in strips:
+            pending.append(loop.run_in_executor(
+                pool, render_strip, ranges, grid.west, grid.north, grid.res, grid.width, *strip))
+            if len(pending) >= 2 * RASTER_WORKERS:
+                yield await pending.pop(0)
+        while pending:
+            yield await pending.pop(0)
+    finally:
+        # Клиент отключился — не считаем оставшиеся полосы
+        for future in pending:
+            future.cancel()
+
+
+# === PNG (палитра, потоковое сжатие) ===
+
+def _png_chunk(kind: bytes, data: bytes) -> bytes:
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+
+def _palette() -> tuple[bytes, bytes]:
+    """0..100: красный -> жёлтый -> зелёный; NODATA — прозрачный."""
+    stops = np.array([(215, 48, 39), (254, 224, 139), (26, 152, 80)], dtype=float)
+    colors = np.zeros((256, 3))
+    t = np.arange(101) / 50
+    low = t <= 1
+    colors[:101][low] = stops[0] + (stops[1] - stops[0]) * t[low, None]
+    colors[:101][~low] = stops[1] + (stops[2] - stops[1]) * (t[~low, None] - 1)
+    alpha = np.full(256, 255, dtype=np.uint8)
+    alpha[NODATA] = 0
+    return np.rint(colors).astype(np.uint8).tobytes(), alpha.tobytes()
+
+
+async def stream_png(strips, width: int, height: int):
+    """Оборачивает поток полос в PNG с палитрой: IDAT-чанк на полосу."""
+    palette, alpha = _palette()
+    yield (b"\x89PNG\r\n\x1a\n"
+           + _png_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 3, 0, 0, 0))
+           + _png_chunk(b"PLTE", palette)
+           + _png_chunk(b"tRNS", alpha))
+
+    compressor = zlib.compressobj(6)
+    async for strip in strips:
+        # Каждая строка PNG начинается с байта фильтра (0 — без фильтра)
+        rows = np.frombuffer(strip, dtype=np.uint8).reshape(-1, width)
+        data = compressor.compress(np.hstack([np.zeros((len(rows), 1), np.uint8), rows]).tobytes())
+        if data:
+            yield _png_chunk(b"IDAT", data)
+    yield _png_chunk(b"IDAT", compressor.flush()) + _png_chunk(b"IEND", b"")
@@ -0,0 +1,91 @@
+"""
+Сборка JSON-ответов в обход jsonable_encoder FastAPI: выборка полей
+(fields=) и сериализация через orjson, если он установлен.
+
+    data = project(data, parse_fields("score,crop_info.TOPMN"))
+    return json_response(data)
+"""
+import hashlib
+import json
+from functools import lru_cache
+import numpy as np
+from fastapi import Response
+
+try:
+    import orjson
+except ImportError:  # необязательная зависимость: без неё — стандартный json
+    orjson = None
+
+JSON_ENCODER = "orjson" if orjson is not None else "json"
+
+
+def _default(value):
+    # Числа NumPy, которые могли остаться в ответе
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(data, encoder: str | None = None) -> bytes:
+    """JSON в UTF-8 без лишних пробелов."""
+    if (encoder or JSON_ENCODER) == "orjson":
+        return orjson.dumps(data, default=_default, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"), default=_default).encode("utf-8")
+
+
+def json_response(data, headers: dict | None = None) -> Response:
+    return Response(dumps(data), media_type="application/json", headers=headers)
+
+
+def etag(body: bytes) -> str:
+    """Сильный ETag по содержимому ответа."""
+    return '"' + hashlib.blake2b(body, digest_size=8).hexdigest() + '"'
+
+
+def parse_fields(fields: str | None) -> tuple[str, ...] | None:
+    """"score, crop_info.TOPMN" -> ("score", "crop_info.TOPMN"); пусто — все поля."""
+    if not fields:
+        return None
+    paths = tuple(path.strip() for path in fields.split(",") if path.strip())
+    return paths or None
+
+
+@lru_cache(maxsize=256)
+def _compile(fields: tuple[str, ...]) -> dict:
+    """Список путей -> дерево {поле: None (целиком) | {вложенные поля}}."""
+    tree = {}
+    for path in fields:
+        *parents, name = path.split(".")
+        node = tree
+        for key in parents:
+            child = node.get(key, {})
+            if child is None:
+                break  # родитель уже выбран целиком
+            node = node.setdefault(key, child)
+        else:
+            node[name] = None
+    return tree
+
+
+def _select(data: dict, tree: dict) -> dict:
+    result = {}
+    for key, subtree in tree.items():
+        if key in data:
+            value = data[key]
+            if subtree is None:
+                result[key] = value
+            elif isinstance(value, dict):
+                result[key] = _select(value, subtree)
+    return result
+
+
+def project(data: dict, fields: tuple[str, ...] | None) -> dict:
+    """
+    Оставляет в ответе только перечисленные поля; вложенные — через точку
+    (weather.main.temp). Отсутствующие поля пропускаются.
+    """
+    if fields is None:
+        return data
+    return _select(data, _compile(fields))
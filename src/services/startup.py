@@ -0,0 +1,26 @@
+import time
+from contextlib import contextmanager
+
+# Точка отсчёта — первый импорт модуля (main.py импортирует его первым)
+STARTED_AT = time.perf_counter()
+
+# Фаза -> длительность, мс
+phases: dict[str, float] = {}
+
+
+@contextmanager
+def timed(phase: str):
+    """Замеряет длительность фазы запуска (импорт, загрузка базы, индексы)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        phases[phase] = round((time.perf_counter() - start) * 1000, 1)
+
+
+def report() -> dict:
+    """Отчёт о запуске: длительности фаз и время с начала импорта."""
+    return {
+        "phases_ms": dict(phases),
+        "since_start_ms": round((time.perf_counter() - STARTED_AT) * 1000, 1),
+    }
@@ -1,12 +1,388 @@
-def calculate_suitability(temp, humidity, crop_data):
-    tmin, tmax = crop_data["TMIN"], crop_data["TMAX"]
-    ropmn, ropmx = crop_data["ROPMN"], crop_data["ROPMX"]
-
-    def score(value, minv, maxv):
-        if value < minv: return max(0, 1 - (minv - value)/10)
-        if value > maxv: return max(0, 1 - (value - maxv)/10)
-        return 1
-
-    t_score = score(temp, tmin, tmax)
-    h_score = score(humidity * 10, ropmn, ropmx)  # примерная нормализация
-    return round((t_score + h_score) / 2, 2)
+import numpy as np
+
+# === ЕДИНЫЙ ДВИЖОК ОЦЕНКИ ПРИГОДНОСТИ ===
+#
+# Каждый фактор оценивается от 0 до 1 по диапазонам EcoCrop: 1 в оптимуме,
+# линейно до 0 на абсолютной границе. Все функции работают с массивами
+# NumPy и транслируются (broadcasting): диапазоны культур формы (C,) и
+# условия формы (L, 1) дают матрицу (L, C) "места × культуры".
+
+FACTORS = ("temperature", "rainfall", "ph", "latitude", "altitude", "photoperiod")
+
+# Столбцы EcoCrop, которые использует движок (PHOTO — отдельно, как маска)
+RANGE_KEYS = (
+    "TOPMN", "TOPMX", "TMIN", "TMAX",
+    "ROPMN", "ROPMX", "RMIN", "RMAX",
+    "PHOPMN", "PHOPMX", "PHMIN", "PHMAX",
+    "LATOPMN", "LATOPMX", "LATMN", "LATMX",
+    "ALTMX",
+    "GMIN", "GMAX",
+)
+
+# Классы длины дня из поля PHOTO: бит, начало и конец интервала, часы
+PHOTO_SHORT, PHOTO_NEUTRAL, PHOTO_LONG = 1, 2, 4
+PHOTO_CLASSES = (
+    (PHOTO_SHORT, 0.0, 12.0),
+    (PHOTO_NEUTRAL, 12.0, 14.0),
+    (PHOTO_LONG, 14.0, 24.0),
+)
+# За сколько часов вне интервала оценка фотопериода падает до 0
+PHOTO_TOLERANCE = 2.0
+
+
+def graded_score(value, opt_min, opt_max, abs_min, abs_max):
+    """
+    Оценка 0..1 для массивов: 1 внутри оптимального диапазона, линейно
+    убывает до 0 на абсолютной границе, 0 за её пределами.
+
+    Если у культуры нет оптимума — берётся абсолютный диапазон и наоборот;
+    если нет ни того, ни другого — NaN (фактор не учитывается).
+    """
+    value = np.asarray(value, dtype=float)
+    opt_min = np.where(np.isnan(opt_min), abs_min, opt_min)
+    opt_max = np.where(np.isnan(opt_max), abs_max, opt_max)
+    abs_min = np.where(np.isnan(abs_min), opt_min, abs_min)
+    abs_max = np.where(np.isnan(abs_max), opt_max, abs_max)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        low = np.where(opt_min > abs_min, (value - abs_min) / (opt_min - abs_min), 0.0)
+        high = np.where(abs_max > opt_max, (abs_max - value) / (abs_max - opt_max), 0.0)
+
+    # Сравнение с NaN даёт False, поэтому отсутствующая граница не ограничивает
+    score = np.where(value < opt_min, low, np.where(value > opt_max, high, 1.0))
+    score = np.clip(score, 0.0, 1.0)
+    missing = np.isnan(opt_min) & np.isnan(opt_max)
+    return np.where(missing | np.isnan(value), np.nan, score)
+
+
+def photoperiod_mask(values: list) -> np.ndarray:
+    """Поле PHOTO -> битовая маска допустимых классов длины дня (NaN — нет данных)."""
+    masks = []
+    for value in values:
+        text = value.lower() if isinstance(value, str) else ""
+        mask = 0
+        if "not sensitive" in text:
+            mask = PHOTO_SHORT | PHOTO_NEUTRAL | PHOTO_LONG
+        if "short" in text:
+            mask |= PHOTO_SHORT
+        if "neutral" in text:
+            mask |= PHOTO_NEUTRAL
+        if "long" in text:
+            mask |= PHOTO_LONG
+        masks.append(mask or np.nan)
+    return np.array(masks, dtype=float)
+
+
+def photoperiod_score(day_length, mask):
+    """Лучшая оценка длины дня среди классов, допустимых для культуры."""
+    day_length = np.asarray(day_length, dtype=float)
+    bits = np.nan_to_num(mask).astype(int)
+    score = np.zeros(np.broadcast_shapes(day_length.shape, bits.shape))
+    for bit, start, end in PHOTO_CLASSES:
+        in_class = graded_score(day_length, start, end, start - PHOTO_TOLERANCE, end + PHOTO_TOLERANCE)
+        score = np.maximum(score, np.where(bits & bit, in_class, 0.0))
+    return np.where(np.isnan(mask) | np.isnan(day_length), np.nan, score)
+
+
+def day_length_hours(lat, day_of_year):
+    """Астрономическая длина дня, часы (широта в градусах, день года 1..366)."""
+    lat = np.radians(np.asarray(lat, dtype=float))
+    declination = np.radians(23.44) * np.sin(2 * np.pi * (284 + np.asarray(day_of_year)) / 365)
+    cos_hour_angle = np.clip(-np.tan(lat) * np.tan(declination), -1.0, 1.0)
+    return 24 / np.pi * np.arccos(cos_hour_angle)
+
+
+def score_crops(ranges: dict, temp=None, rain=None, ph=None, lat=None, altitude=None, day_length=None) -> dict:
+    """
+    Оценивает культуры по условиям места — одним векторным проходом.
+
+    ranges — столбцы EcoCrop в виде массивов NumPy (см. EcoCropService.ranges).
+    Условия — числа или массивы, транслируемые с диапазонами.
+    Возвращает оценки по каждому переданному фактору, а также:
+      "total" — минимум по известным факторам (ограничивающий фактор, как в EcoCrop);
+      "mean"  — среднее по известным факторам (для упорядочивания при равном total).
+    """
+    r = ranges
+    factors = {}
+    if temp is not None:
+        factors["temperature"] = graded_score(temp, r["TOPMN"], r["TOPMX"], r["TMIN"], r["TMAX"])
+    if rain is not None:
+        factors["rainfall"] = graded_score(rain, r["ROPMN"], r["ROPMX"], r["RMIN"], r["RMAX"])
+    if ph is not None:
+        factors["ph"] = graded_score(ph, r["PHOPMN"], r["PHOPMX"], r["PHMIN"], r["PHMAX"])
+    if lat is not None:
+        # LAT*MN — граница в южном полушарии, LAT*MX — в северном
+        factors["latitude"] = graded_score(lat, -r["LATOPMN"], r["LATOPMX"], -r["LATMN"], r["LATMX"])
+    if altitude is not None:
+        nan = np.full_like(r["ALTMX"], np.nan)
+        factors["altitude"] = graded_score(altitude, nan, r["ALTMX"], nan, r["ALTMX"])
+    if day_length is not None:
+        factors["photoperiod"] = photoperiod_score(day_length, r["PHOTO"])
+
+    if not factors:
+        nan = np.full(len(r["TMIN"]), np.nan)
+        return {"total": nan, "mean": nan}
+    return _combine(factors)
+
+
+def _combine(factors: dict) -> dict:
+    """Добавляет к оценкам факторов "total" и "mean"."""
+    stacked = np.stack(np.broadcast_arrays(*factors.values()))
+    known = (~np.isnan(stacked)).sum(axis=0)
+    with np.errstate(invalid="ignore"):
+        total = np.nanmin(np.where(known > 0, stacked, 0.0), axis=0)
+    mean = np.nansum(stacked, axis=0) / np.maximum(known, 1)
+    factors["total"] = np.where(known > 0, total, np.nan)
+    factors["mean"] = np.where(known > 0, mean, np.nan)
+    return factors
+
+
+# === СЕЗОННАЯ ОЦЕНКА ПО КЛИМАТИЧЕСКИМ НОРМАМ ===
+
+MONTH_DAYS = 365 / 12
+
+
+def season_months(gmin, gmax) -> np.ndarray:
+    """
+    Длительность вегетации в месяцах, как в модели EcoCrop (Hijmans):
+    среднее GMIN и GMAX, округлённое до месяца. 0 или NaN в базе — нет
+    данных, тогда оценивается весь год.
+    """
+    gmin = np.where(np.nan_to_num(gmin) > 0, gmin, np.nan)
+    gmax = np.where(np.nan_to_num(gmax) > 0, gmax, np.nan)
+    days = np.where(np.isnan(gmin), gmax, np.where(np.isnan(gmax), gmin, (gmin + gmax) / 2))
+    months = np.rint(np.nan_to_num(days, nan=365) / MONTH_DAYS)
+    return np.clip(months, 1, 12).astype(int)
+
+
+def score_season(ranges: dict, tavg, prec, start_month: int, lat=None, altitude=None, ph=None) -> dict:
+    """
+    Оценивает культуры за вегетационный период, начинающийся в start_month
+    (1..12), по климатическим нормам места: tavg — 12 средних температур
+    месяца, °C; prec — 12 сумм осадков, мм.
+
+    Температура оценивается по каждому месяцу периода, берётся худший месяц;
+    осадки — сумма за период; длина дня — в середине периода. Длительность
+    периода своя у каждой культуры (season_months). Кроме факторов,
+    возвращает "months", "temp_mean" и "rain" — агрегаты за период.
+    """
+    r = ranges
+    columns = np.arange(len(r["TMIN"]))
+    months = season_months(r["GMIN"], r["GMAX"])
+    # Месяцы по порядку от начала периода; накопленные значения по длине периода
+    order = (start_month - 1 + np.arange(12)) % 12
+    tavg = np.asarray(tavg, dtype=float)[order]
+    prec = np.asarray(prec, dtype=float)[order]
+
+    monthly = graded_score(tavg[:, None], r["TOPMN"], r["TOPMX"], r["TMIN"], r["TMAX"])  # (12, C)
+    worst = np.minimum.accumulate(monthly, axis=0)
+    rain = np.cumsum(prec)[months - 1]
+    temp_mean = (np.cumsum(tavg) / np.arange(1, 13))[months - 1]
+
+    factors = {"temperature": worst[months - 1, columns]}
+    if lat is not None:
+        middle = (start_month - 1) * MONTH_DAYS + months * MONTH_DAYS / 2
+        day_length = day_length_hours(lat, middle % 365 + 1)
+    else:
+        day_length = None
+    others = score_crops(ranges, rain=rain, ph=ph, lat=lat, altitude=altitude, day_length=day_length)
+    others.pop("total")
+    others.pop("mean")
+    factors.update(others)
+
+    scores = _combine(factors)
+    scores.update({"months": months, "temp_mean": temp_mean, "rain": rain})
+    return scores
+
+
+def best_season(ranges: dict, tavg, prec, lat=None, altitude=None) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Лучшая сезонная оценка одной культуры для множества мест (растр).
+
+    ranges — диапазоны одной культуры (массивы формы (1,)); tavg, prec —
+    нормы мест формы (N, 12); lat, altitude — (N,). Перебираются все 12
+    месяцев посева, правила те же, что в score_season.
+    Возвращает (оценка (N,), лучший месяц посева 1..12 (N,)); NaN — нет данных.
+    """
+    r = ranges
+    months = int(season_months(r["GMIN"], r["GMAX"])[0])
+    monthly = graded_score(tavg, r["TOPMN"], r["TOPMX"], r["TMIN"], r["TMAX"])  # (N, 12)
+    prec = np.asarray(prec, dtype=float)
+
+    # Окно из months месяцев от каждого месяца посева — сдвигами по кругу
+    temperature, rain = monthly.copy(), prec.copy()
+    for shift in range(1, months):
+        temperature = np.minimum(temperature, np.roll(monthly, -shift, axis=1))
+        rain += np.roll(prec, -shift, axis=1)
+
+    factors = {
+        "temperature": temperature,
+        "rainfall": graded_score(rain, r["ROPMN"], r["ROPMX"], r["RMIN"], r["RMAX"]),
+    }
+    # Широта и высота — столбцы (N, 1), как места в score_crops
+    lat = None if lat is None else np.asarray(lat, dtype=float)[:, None]
+    altitude = None if altitude is None else np.asarray(altitude, dtype=float)[:, None]
+    others = score_crops(ranges, lat=lat, altitude=altitude)
+    others.pop("total", None)
+    others.pop("mean", None)
+    factors.update(others)
+
+    total = _combine(factors)["total"]  # (N, 12)
+    # Без климата места нет данных, даже если известны широта и высота
+    known = ~np.isnan(total).all(axis=1) & ~np.isnan(monthly).all(axis=1)
+    month = np.argmax(np.nan_to_num(total, nan=-1.0), axis=1)
+    score = np.where(known, total[np.arange(len(total)), month], np.nan)
+    return score, month + 1
+
+
+# === ОЦЕНКА ПО ПРОГНОЗУ ПОГОДЫ ===
+
+def score_forecast(ranges: dict, temp, temp_min=None, temp_max=None) -> dict:
+    """
+    Оценивает культуры по шагам прогноза одним векторным проходом:
+    temp, temp_min, temp_max — температуры шагов формы (T,), °C.
+
+    Возвращает матрицы (T, C) "шаги × культуры":
+      "temperature" — оценка шага по TOPMN/TOPMX и TMIN/TMAX;
+      "frost" — минимум шага не выше KTMP (температура гибели), если она известна;
+      "cold"/"heat" — минимум ниже TMIN / максимум выше TMAX;
+    и по культурам (C,):
+      "mean", "min" — средняя и худшая оценка шагов;
+      "optimal_share" — доля шагов в оптимуме;
+      "total" — средняя оценка, 0 при угрозе гибели от заморозка.
+    """
+    r = ranges
+    temp = np.asarray(temp, dtype=float)[:, None]
+    temp_min = temp if temp_min is None else np.asarray(temp_min, dtype=float)[:, None]
+    temp_max = temp if temp_max is None else np.asarray(temp_max, dtype=float)[:, None]
+
+    steps = graded_score(temp, r["TOPMN"], r["TOPMX"], r["TMIN"], r["TMAX"])  # (T, C)
+    frost = temp_min <= r["KTMP"] if "KTMP" in r else np.zeros_like(steps, dtype=bool)
+    cold = temp_min < r["TMIN"]
+    heat = temp_max > r["TMAX"]
+
+    known = (~np.isnan(steps)).sum(axis=0)
+    mean = np.nansum(steps, axis=0) / np.maximum(known, 1)
+    worst = np.nanmin(np.where(known > 0, steps, 0.0), axis=0)
+    optimal = (steps == 1.0).sum(axis=0) / np.maximum(known, 1)
+    total = np.where(frost.any(axis=0), 0.0, mean)
+
+    nan = np.where(known > 0, 0.0, np.nan)  # NaN для культур без температурных диапазонов
+    return {
+        "temperature": steps,
+        "frost": frost,
+        "cold": cold,
+        "heat": heat,
+        "mean": mean + nan,
+        "min": worst + nan,
+        "optimal_share": optimal + nan,
+        "total": total + nan,
+    }
+
+
+def risk_windows(flags) -> list[tuple[int, int]]:
+    """Непрерывные отрезки True в ряду шагов: [(первый шаг, последний шаг), ...]."""
+    edges = np.diff(np.concatenate(([0], np.asarray(flags, dtype=np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1) - 1
+    return list(zip(starts.tolist(), ends.tolist()))
+
+
+def calculate_suitability(crop_data: dict, **conditions) -> dict:
+    """
+    Оценка одной культуры (запись EcoCrop) по условиям места:
+    {"фактор": 0..1 или None, ..., "total": ..., "mean": ...}.
+
+    Прежняя calculate_suitability(temp, humidity, crop_data) возвращала одно
+    число; теперь условия передаются по имени, как в score_crops:
+    calculate_suitability(crop_data, temp=..., rain=..., lat=...).
+    """
+    ranges = {col: np.array([_number(crop_data.get(col))]) for col in RANGE_KEYS}
+    ranges["PHOTO"] = photoperiod_mask([crop_data.get("PHOTO")])
+    scores = score_crops(ranges, **conditions)
+    return {name: _rounded(values[0]) for name, values in scores.items()}
+
+
+def _number(value) -> float:
+    return float(value) if isinstance(value, (int, float)) else np.nan
+
+
+def _rounded(value) -> float | None:
+    value = float(value)
+    return None if np.isnan(value) else round(value, 3)
+
+
+# === ПОЯСНЕНИЯ ДЛЯ ПОЛЬЗОВАТЕЛЯ ===
+
+# фактор -> (название, единицы, оптимум мин/макс, абсолют мин/макс, "слишком мало", "слишком много")
+_FACTOR_TEXT = {
+    "temperature": ("Temperature", "°C", "TOPMN", "TOPMX", "TMIN", "TMAX", "🥶 Too cold", "🔥 Too hot"),
+    "rainfall": ("Annual rainfall", " mm", "ROPMN", "ROPMX", "RMIN", "RMAX", "🏜️ Too dry", "🌊 Too wet"),
+    "ph": ("Soil pH", "", "PHOPMN", "PHOPMX", "PHMIN", "PHMAX", "❌ Soil too acidic", "❌ Soil too alkaline"),
+    "latitude": ("Latitude", "°", "LATOPMN", "LATOPMX", "LATMN", "LATMX", "❌ Too far south", "❌ Too far north"),
+    "altitude": ("Altitude", " m", None, "ALTMX", None, "ALTMX", "", "⛰️ Too high"),
+}
+
+
+# фактор -> имя условия в score_crops
+_CONDITION = {
+    "temperature": "temp",
+    "rainfall": "rain",
+    "ph": "ph",
+    "latitude": "lat",
+    "altitude": "altitude",
+}
+
+
+def describe_factors(crop_data: dict, conditions: dict, scores: dict) -> list[str]:
+    """Человекочитаемые пояснения по каждому оценённому фактору."""
+    details = []
+    for factor, (label, unit, opt_min, opt_max, abs_min, abs_max, low, high) in _FACTOR_TEXT.items():
+        if factor not in scores:
+            continue
+        value = conditions[_CONDITION[factor]]
+        score = scores[factor]
+        if score is None:
+            details.append(f"❔ No {label.lower()} range in EcoCrop for this crop.")
+            continue
+
+        # Южная граница широты хранится положительным числом
+        sign = -1 if factor == "latitude" else 1
+        lo_opt, hi_opt = _bound(crop_data, opt_min, sign), _bound(crop_data, opt_max)
+        lo_abs, hi_abs = _bound(crop_data, abs_min, sign), _bound(crop_data, abs_max)
+        # Как в graded_score: недостающий диапазон заменяется другим
+        lo_opt, lo_abs = lo_opt if lo_opt is not None else lo_abs, lo_abs if lo_abs is not None else lo_opt
+        hi_opt, hi_abs = hi_opt if hi_opt is not None else hi_abs, hi_abs if hi_abs is not None else hi_opt
+
+        if lo_opt is None:
+            optimal = f"≤ {hi_opt}{unit}"
+        elif hi_opt is None:
+            optimal = f"≥ {lo_opt}{unit}"
+        else:
+            optimal = f"{lo_opt}–{hi_opt}{unit}"
+
+        if score == 1:
+            details.append(f"✅ {label} is optimal ({value}{unit}, optimal {optimal})")
+        elif score > 0:
+            details.append(f"⚠️ {label} is tolerable but not optimal ({value}{unit}, optimal {optimal})")
+        elif lo_abs is not None and value < lo_abs:
+            details.append(f"{low} (current {value}{unit}, needs ≥ {lo_abs}{unit})")
+        else:
+            details.append(f"{high} (current {value}{unit}, needs ≤ {hi_abs}{unit})")
+
+    if "photoperiod" in scores:
+        hours = round(conditions["day_length"], 1)
+        photo = crop_data.get("PHOTO") or "unknown"
+        score = scores["photoperiod"]
+        if score is None:
+            details.append("❔ No photoperiod data in EcoCrop for this crop.")
+        elif score == 1:
+            details.append(f"☀️ Day length {hours} h matches the crop ({photo}).")
+        else:
+            details.append(f"🌗 Day length {hours} h does not match the crop ({photo}).")
+    return details
+
+
+def _bound(crop_data: dict, col: str | None, sign: int = 1):
+    value = crop_data.get(col) if col else None
+    return None if value is None else sign * value
@@ -1,19 +1,249 @@
-import requests
+import asyncio
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+import httpx
 import logging
+import numpy as np
+import config
 from config import OPENWEATHER_API_KEY
+from services.cache import TTLCache
+from services.location_service import LocationResolver, normalize_city
+from services.metrics import registry, track, upstream_errors, upstream_seconds
 
-# class WeatherService:
-#     @staticmethod
-def get_weather(city: str) -> dict:
-    """Возвращает погоду для указанного города."""
-    url = f"http://api.openweathermap.org/data/2.5/weather?q={city}&appid={OPENWEATHER_API_KEY}&units=metric"
+# Настройки можно переопределить в config.py
+OPENWEATHER_URL = getattr(config, "OPENWEATHER_URL", "http://api.openweathermap.org/data/2.5")
+WEATHER_TIMEOUT = getattr(config, "WEATHER_TIMEOUT", 5.0)                   # сек на запрос
+WEATHER_MAX_CONCURRENCY = getattr(config, "WEATHER_MAX_CONCURRENCY", 100)  # одновременных запросов к OpenWeather
+WEATHER_RETRIES = getattr(config, "WEATHER_RETRIES", 2)                     # повторов после первой попытки
+WEATHER_BACKOFF = getattr(config, "WEATHER_BACKOFF", 0.2)                   # сек, удваивается с каждым повтором
+WEATHER_RETRY_AFTER_MAX = getattr(config, "WEATHER_RETRY_AFTER_MAX", 10.0)  # сек, предел паузы из Retry-After
+
+WEATHER_CACHE_TTL = getattr(config, "WEATHER_CACHE_TTL", 600)                   # сек, погода почти не меняется за 10 минут
+WEATHER_CACHE_NEGATIVE_TTL = getattr(config, "WEATHER_CACHE_NEGATIVE_TTL", 3600)  # сек, для несуществующих городов
+WEATHER_CACHE_SIZE = getattr(config, "WEATHER_CACHE_SIZE", 1024)
+# Прогноз 5 дней / 3 часа OpenWeather пересчитывает раз в 3 часа
+FORECAST_CACHE_TTL = getattr(config, "FORECAST_CACHE_TTL", 1800)               # сек
+
+
+def retry_after(response: httpx.Response, default: float) -> float:
+    """
+    Пауза из заголовка Retry-After (секунды или HTTP-дата), не больше
+    WEATHER_RETRY_AFTER_MAX; default — если заголовка нет или он не разобран.
+    """
+    value = response.headers.get("Retry-After")
+    if value is None:
+        return default
     try:
-        response = requests.get(url)
+        delay = float(value)
+    except ValueError:
+        try:
+            delay = (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds()
+        except (TypeError, ValueError):
+            return default
+    return min(max(delay, 0.0), WEATHER_RETRY_AFTER_MAX)
+
+
+class WeatherClient:
+    """
+    Асинхронный клиент OpenWeather: общий пул соединений (keep-alive),
+    таймауты, ограничение числа одновременных запросов и повтор с
+    экспоненциальной задержкой при сетевых ошибках, 429 и 5xx; если
+    сервер прислал Retry-After, ждём столько, сколько он просит.
+
+    transport позволяет подменить сеть, например httpx.ASGITransport
+    с заглушкой из stubs/openweather.py.
+    """
+
+    RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+    def __init__(
+        self,
+        base_url: str = OPENWEATHER_URL,
+        api_key: str = OPENWEATHER_API_KEY,
+        timeout: float = WEATHER_TIMEOUT,
+        max_concurrency: int = WEATHER_MAX_CONCURRENCY,
+        retries: int = WEATHER_RETRIES,
+        backoff: float = WEATHER_BACKOFF,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ):
+        self.base_url = base_url
+        self.api_key = api_key
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.transport = transport
+        self._client: httpx.AsyncClient | None = None
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # Создаём при первом запросе — уже внутри работающего event loop
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_concurrency,
+                    max_keepalive_connections=self.max_concurrency,
+                ),
+                transport=self.transport,
+            )
+        return self._client
+
+    async def get(self, path: str, upstream: str = "openweather", **params) -> httpx.Response:
+        """
+        GET к OpenWeather с ключом и метрическими единицами.
+        upstream — метка для метрик задержки и ошибок.
+        """
+        params = {**params, "appid": self.api_key, "units": "metric"}
+        start = time.perf_counter()
+        try:
+            for attempt in range(self.retries + 1):
+                last = attempt == self.retries
+                delay = self.backoff * 2 ** attempt
+                # Слот занят только на время запроса, паузы между повторами его не держат
+                async with self._semaphore:
+                    try:
+                        response = await self.client.get(path, params=params)
+                    except httpx.TransportError as e:
+                        upstream_errors.inc(upstream=upstream, kind=type(e).__name__)
+                        if last:
+                            raise
+                    else:
+                        if response.status_code >= 400:
+                            upstream_errors.inc(upstream=upstream, kind=str(response.status_code))
+                        if response.status_code not in self.RETRY_STATUSES or last:
+                            return response
+                        delay = retry_after(response, default=delay)
+                await asyncio.sleep(delay)
+        finally:
+            upstream_seconds.observe(time.perf_counter() - start, upstream=upstream)
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+weather_client = WeatherClient()
+weather_cache = TTLCache(maxsize=WEATHER_CACHE_SIZE)
+forecast_cache = TTLCache(maxsize=WEATHER_CACHE_SIZE)
+location_resolver = LocationResolver(weather_client)
+
+
+@registry.collect("agro_cache_entries", "Entries held in an in-process cache.", ("cache",))
+def _cache_entries() -> dict:
+    return {
+        ("weather",): len(weather_cache),
+        ("forecast",): len(forecast_cache),
+        ("location",): len(location_resolver.cache),
+    }
+
+
+@registry.collect("agro_cache_events_total", "Cache lookups by result, and evictions.", ("cache", "result"), "counter")
+def _cache_events() -> dict:
+    events = {}
+    for name, cache in (("weather", weather_cache), ("forecast", forecast_cache), ("location", location_resolver.cache)):
+        for result in ("hits", "misses", "coalesced", "evictions"):
+            events[(name, result)] = getattr(cache, result)
+    return events
+
+
+def coordinates_key(lat: float, lon: float) -> str:
+    """Ключ кэша погоды: координаты с точностью ~1 км."""
+    return f"{lat:.2f},{lon:.2f}"
+
+
+async def get_weather(city: str) -> dict:
+    """
+    Возвращает погоду для указанного города (с кэшированием).
+    Город сначала разрешается в координаты, погода кэшируется по ним —
+    разные написания одного места делят одну запись. В ответ добавляется
+    "location" из справочника мест.
+    """
+    with track("location"):
+        location = await location_resolver.resolve(city)
+    if "error" in location:
+        return location
+    with track("weather"):
+        weather = await get_weather_at(location["lat"], location["lon"])
+    if "error" in weather:
+        return weather
+    return {**weather, "location": location}
+
+
+async def get_weather_at(lat: float, lon: float) -> dict:
+    """Погода по координатам (с кэшированием)."""
+    key = coordinates_key(lat, lon)
+    return await weather_cache.get_or_load(key, lambda: _fetch_weather(lat, lon))
+
+
+async def get_forecast(city: str) -> dict:
+    """
+    Прогноз 5 дней / 3 часа для города (с кэшированием по координатам,
+    как get_weather): столбцы по шагам и "location".
+    """
+    with track("location"):
+        location = await location_resolver.resolve(city)
+    if "error" in location:
+        return location
+    with track("forecast"):
+        forecast = await get_forecast_at(location["lat"], location["lon"])
+    if "error" in forecast:
+        return forecast
+    return {**forecast, "location": location}
+
+
+async def get_forecast_at(lat: float, lon: float) -> dict:
+    """Прогноз по координатам (с кэшированием)."""
+    key = coordinates_key(lat, lon)
+    return await forecast_cache.get_or_load(key, lambda: _fetch_forecast(lat, lon))
+
+
+async def _fetch_weather(lat: float, lon: float) -> tuple[dict, float | None]:
+    return await _fetch("/weather", lat, lon, WEATHER_CACHE_TTL)
+
+
+async def _fetch_forecast(lat: float, lon: float) -> tuple[dict, float | None]:
+    return await _fetch("/forecast", lat, lon, FORECAST_CACHE_TTL, parse=forecast_columns)
+
+
+async def _fetch(path: str, lat: float, lon: float, ttl: float, parse=None) -> tuple[dict, float | None]:
+    """Запрос к OpenWeather; возвращает ответ и TTL для кэша (None — не кэшировать)."""
+    try:
+        response = await weather_client.get(path, lat=lat, lon=lon)
         response.raise_for_status()
-        return response.json()
-    
-    except requests.exceptions.HTTPError:
-        return {"error": f"You entered an invalid city: '{city}'."}
-    except requests.exceptions.RequestException as e:
-        logging.error(f"Error requesting OpenWeather: {e}")
-        return {"error": "Failed to retrieve weather data. Please try again later."}
\ No newline at end of file
+        data = response.json()
+        return (parse(data) if parse else data), ttl
+
+    except httpx.HTTPStatusError as e:
+        # Кэшируем только "место не найдено", а не 401/429/5xx
+        ttl = WEATHER_CACHE_NEGATIVE_TTL if e.response.status_code == 404 else None
+        return {"error": f"No weather data for coordinates {lat}, {lon}."}, ttl
+    except httpx.HTTPError as e:
+        logging.error(f"Error requesting OpenWeather: {e!r}")
+        return {"error": "Failed to retrieve weather data. Please try again later."}, None
+
+
+def forecast_columns(data: dict) -> dict:
+    """
+    Ответ /forecast -> массивы NumPy по шагам. Разбирается один раз при
+    загрузке в кэш, запросы получают готовые столбцы.
+    """
+    steps = data.get("list", [])
+
+    def column(get) -> np.ndarray:
+        return np.array([get(step) for step in steps], dtype=float)
+
+    return {
+        "dt": np.array([step["dt"] for step in steps], dtype=np.int64),
+        "temp": column(lambda step: step.get("main", {}).get("temp", np.nan)),
+        "temp_min": column(lambda step: step.get("main", {}).get("temp_min", np.nan)),
+        "temp_max": column(lambda step: step.get("main", {}).get("temp_max", np.nan)),
+        "humidity": column(lambda step: step.get("main", {}).get("humidity", np.nan)),
+        "rain": column(lambda step: step.get("rain", {}).get("3h", 0.0)),
+        "pop": column(lambda step: step.get("pop", np.nan)),
+        "timezone": data.get("city", {}).get("timezone", 0),  # сдвиг от UTC, сек
+    }
@@ -0,0 +1,140 @@
+"""
+Заглушка OpenWeather для локальной проверки клиента и нагрузочных тестов.
+
+Отдельный процесс:
+    OPENWEATHER_STUB_LATENCY=0.05 uvicorn stubs.openweather:app --port 8001
+    # config.py: OPENWEATHER_URL = "http://127.0.0.1:8001/data/2.5"
+    #            GEOCODING_URL = "http://127.0.0.1:8001/geo/1.0"
+
+В том же процессе:
+    WeatherClient(base_url="http://stub/data/2.5",
+                  transport=httpx.ASGITransport(app=create_app(latency=0.05)))
+"""
+import asyncio
+import hashlib
+import math
+import os
+import time
+from fastapi import FastAPI, Query
+from fastapi.responses import JSONResponse
+
+# Города, которые заглушка "не знает" (404 / пустой ответ геокодера)
+UNKNOWN_CITIES = {"nowhere", "atlantis"}
+
+
+def _seed(text: str) -> int:
+    return int(hashlib.md5(text.lower().encode()).hexdigest(), 16)
+
+
+def _fake_place(city: str) -> dict:
+    """Детерминированные координаты города, как у геокодера OpenWeather."""
+    name, *rest = [part.strip() for part in city.split(",")]
+    seed = _seed(name)
+    return {
+        "name": name.title(),
+        "lat": seed % 120 - 60.0 + seed % 97 / 100,
+        "lon": seed % 360 - 180.0 + seed % 89 / 100,
+        "country": rest[-1].upper() if rest else "XX",
+    }
+
+
+def _fake_weather(lat: float, lon: float) -> dict:
+    """Детерминированная "погода": одинаковая для одних и тех же координат."""
+    seed = _seed(f"{lat:.2f},{lon:.2f}")
+    now = int(time.time())
+    return {
+        "coord": {"lon": lon, "lat": lat},
+        "weather": [{"id": 801, "main": "Clouds", "description": "few clouds", "icon": "02d"}],
+        "main": {
+            "temp": round(seed % 400 / 10 - 5, 1),
+            "feels_like": round(seed % 400 / 10 - 7, 1),
+            "pressure": 1000 + seed % 30,
+            "humidity": 20 + seed % 80,
+        },
+        "wind": {"speed": seed % 150 / 10, "deg": seed % 360},
+        "clouds": {"all": seed % 100},
+        "sys": {"country": "XX", "sunrise": now - 6 * 3600, "sunset": now + 6 * 3600},
+        "timezone": 0,
+        "name": "",
+        "cod": 200,
+    }
+
+
+def _fake_forecast(lat: float, lon: float, steps: int = 40) -> dict:
+    """Детерминированный прогноз на 5 дней с шагом 3 часа и суточным ходом температуры."""
+    base = _fake_weather(lat, lon)["main"]["temp"]
+    seed = _seed(f"forecast:{lat:.2f},{lon:.2f}")
+    start = (int(time.time()) // 10800 + 1) * 10800
+    items = []
+    for i in range(steps):
+        dt = start + i * 10800
+        hour = (dt // 3600 + lon / 15) % 24
+        # Минимум около 5 утра, максимум около 15 часов местного времени; плюс медленный дрейф
+        temp = base + 6 * math.sin((hour - 9) / 24 * 2 * math.pi) + 3 * math.sin(i / 13 + seed % 7)
+        rain = round(seed % (i + 7) / 4, 2) if (seed >> i) % 5 == 0 else 0.0
+        items.append({
+            "dt": dt,
+            "main": {
+                "temp": round(temp, 2),
+                "feels_like": round(temp - 1.5, 2),
+                "temp_min": round(temp - 1.0, 2),
+                "temp_max": round(temp + 1.0, 2),
+                "pressure": 1000 + (seed + i) % 30,
+                "humidity": 30 + (seed + 7 * i) % 70,
+            },
+            "weather": [{"id": 500 if rain else 801, "main": "Rain" if rain else "Clouds",
+                         "description": "light rain" if rain else "few clouds", "icon": "10d" if rain else "02d"}],
+            "pop": 0.8 if rain else round((seed >> i) % 40 / 100, 2),
+            **({"rain": {"3h": rain}} if rain else {}),
+            "dt_txt": time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(dt)),
+        })
+    return {
+        "cod": "200",
+        "cnt": steps,
+        "list": items,
+        "city": {"coord": {"lat": lat, "lon": lon}, "country": "XX", "timezone": round(lon / 15) * 3600},
+    }
+
+
+def create_app(latency: float = 0.0) -> FastAPI:
+    """Приложение-заглушка с искусственной задержкой ответа (сек)."""
+    app = FastAPI(title="OpenWeather stub")
+    app.state.requests = 0
+    app.state.geocoding_requests = 0
+    app.state.forecast_requests = 0
+
+    @app.get("/data/2.5/weather")
+    async def weather(q: str | None = None, lat: float | None = None, lon: float | None = None,
+                      appid: str = "", units: str = "metric"):
+        app.state.requests += 1
+        if latency:
+            await asyncio.sleep(latency)
+        if q is not None:
+            if q.split(",")[0].strip().lower() in UNKNOWN_CITIES:
+                return JSONResponse({"cod": "404", "message": "city not found"}, status_code=404)
+            place = _fake_place(q)
+            return {**_fake_weather(place["lat"], place["lon"]), "name": place["name"]}
+        if lat is None or lon is None:
+            return JSONResponse({"cod": "400", "message": "Nothing to geocode"}, status_code=400)
+        return _fake_weather(lat, lon)
+
+    @app.get("/data/2.5/forecast")
+    async def forecast(lat: float, lon: float, cnt: int = 40, appid: str = "", units: str = "metric"):
+        app.state.forecast_requests += 1
+        if latency:
+            await asyncio.sleep(latency)
+        return _fake_forecast(lat, lon, steps=min(cnt, 40))
+
+    @app.get("/geo/1.0/direct")
+    async def geocode(q: str = Query(...), limit: int = 5, appid: str = ""):
+        app.state.geocoding_requests += 1
+        if latency:
+            await asyncio.sleep(latency)
+        if q.split(",")[0].strip().lower() in UNKNOWN_CITIES:
+            return []
+        return [_fake_place(q)]
+
+    return app
+
+
+app = create_app(latency=float(os.getenv("OPENWEATHER_STUB_LATENCY", "0")))
@@ -0,0 +1,29 @@
+import os
+import sys
+import types
+import pytest
+
+# Тесты запускаются из src/: python -m pytest tests
+SRC = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SRC)
+os.chdir(SRC)
+
+# config.py не хранится в репозитории (ключ API) — для тестов хватает значений по умолчанию
+try:
+    import config  # noqa: F401
+except ImportError:
+    config = types.ModuleType("config")
+    config.ECOCROP_PATH = "data/EcoCrop_DB.csv"
+    config.OPENWEATHER_API_KEY = "test"
+    sys.modules["config"] = config
+
+
+@pytest.fixture(scope="module")
+def client():
+    """Клиент приложения; база загружается при первом запросе."""
+    from fastapi.testclient import TestClient
+    import main
+
+    main.ECOCROP_WARMUP = "lazy"
+    with TestClient(main.app) as client:
+        yield client
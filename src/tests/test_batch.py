@@ -0,0 +1,77 @@
+import json
+import httpx
+import numpy as np
+import pytest
+from routers import recommend
+from services import location_service, weather_service
+from services.cache import TTLCache
+from services.location_service import LocationResolver
+from services.weather_service import WeatherClient
+from stubs.openweather import create_app
+
+
+@pytest.fixture
+def stub(monkeypatch, tmp_path):
+    """OpenWeather-заглушка, пустые кэши и справочник мест во временном каталоге."""
+    app = create_app()
+    client = WeatherClient(base_url="http://stub/data/2.5", transport=httpx.ASGITransport(app=app))
+    resolver = LocationResolver(client, store_path=str(tmp_path / "locations.sqlite"),
+                                geocoding_url="http://stub/geo/1.0")
+    monkeypatch.setattr(weather_service, "weather_client", client)
+    monkeypatch.setattr(weather_service, "location_resolver", resolver)
+    monkeypatch.setattr(weather_service, "weather_cache", TTLCache())
+    # Высота места и климатические нормы — без файлов сетки
+    monkeypatch.setattr(location_service, "_elevation", lambda lat, lon: 300)
+    monkeypatch.setattr(recommend, "climate_at", lambda lat, lon: {"tavg": np.full(12, 15.0), "prec": np.full(12, 70.0)})
+    return app
+
+
+def _lines(client, body: dict) -> list[dict]:
+    response = client.post("/recommend/batch", json=body)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def test_batch_streams_one_line_per_pair(client, stub):
+    lines = _lines(client, {"locations": ["Paris", "Berlin"], "crops": ["maize", "nosuchcrop"],
+                            "pairs": [{"city": "paris ", "crop": "wheat"}]})
+    assert [(line["city"], line["crop"]) for line in lines] == [
+        ("Paris", "maize"), ("Paris", "nosuchcrop"), ("paris ", "wheat"),
+        ("Berlin", "maize"), ("Berlin", "nosuchcrop"),
+    ]
+    assert "error" in lines[1] and "error" in lines[4]
+    assert lines[0]["ScientificName"] == "zea mays"
+    # Погода запрашивается один раз на место
+    assert stub.state.requests == 2
+
+
+def test_batch_scores_match_check(client, stub):
+    line = _lines(client, {"pairs": [{"city": "Paris", "crop": "maize"}]})[0]
+    check = client.get("/recommend/check", params={"city": "Paris", "crop": "maize"}).json()
+    assert check["rain_source"] == "climate normals"
+    assert line["suitability"] == check["score"]
+    assert line["scores"]["rainfall"] == check["scores"]["rainfall"] is not None
+    assert line["scores"]["altitude"] == check["scores"]["altitude"] is not None
+    assert {factor: value for factor, value in check["scores"].items() if factor not in ("total", "mean")} \
+        == line["scores"]
+
+
+def test_batch_turns_location_exception_into_error_line(client, stub, monkeypatch):
+    get_weather = recommend.get_weather
+
+    async def flaky(city):
+        if city == "Broken":
+            raise ValueError("bad JSON from upstream")
+        return await get_weather(city)
+
+    monkeypatch.setattr(recommend, "get_weather", flaky)
+    lines = _lines(client, {"locations": ["Paris", "Broken", "Berlin"], "crops": ["maize"]})
+    assert [line["city"] for line in lines] == ["Paris", "Broken", "Berlin"]
+    assert "error" in lines[1]
+    assert "error" not in lines[0] and "error" not in lines[2]
+
+
+def test_batch_without_crops_fetches_no_weather(client, stub):
+    assert _lines(client, {"locations": ["Paris", "Berlin"]}) == []
+    assert stub.state.requests == 0 and stub.state.geocoding_requests == 0
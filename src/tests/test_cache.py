@@ -0,0 +1,68 @@
+import asyncio
+import httpx
+import pytest
+from services import weather_service
+from services.cache import TTLCache
+from services.weather_service import WeatherClient
+from stubs.openweather import create_app
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    """OpenWeather-заглушка с задержкой и пустой кэш погоды."""
+    app = create_app(latency=0.05)
+    client = WeatherClient(base_url="http://stub/data/2.5", transport=httpx.ASGITransport(app=app))
+    monkeypatch.setattr(weather_service, "weather_client", client)
+    monkeypatch.setattr(weather_service, "weather_cache", TTLCache(maxsize=16))
+    return app
+
+
+def test_concurrent_misses_call_upstream_once(stub):
+    async def run():
+        results = await asyncio.gather(*(weather_service.get_weather_at(48.85, 2.35) for _ in range(10)))
+        await weather_service.weather_client.aclose()
+        return results
+
+    results = asyncio.run(run())
+    assert stub.state.requests == 1
+    assert all(result == results[0] and "error" not in result for result in results)
+    stats = weather_service.weather_cache.stats()
+    assert (stats["misses"], stats["coalesced"], stats["size"]) == (1, 9, 1)
+
+
+def test_cancelled_leader_does_not_cancel_waiters(stub):
+    async def run():
+        leader = asyncio.create_task(weather_service.get_weather_at(48.85, 2.35))
+        await asyncio.sleep(0)
+        waiters = [asyncio.create_task(weather_service.get_weather_at(48.85, 2.35)) for _ in range(3)]
+        await asyncio.sleep(0)
+        leader.cancel()
+        results = await asyncio.gather(*waiters)
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        await weather_service.weather_client.aclose()
+        return results
+
+    results = asyncio.run(run())
+    assert stub.state.requests == 1
+    assert all("error" not in result for result in results)
+    assert len(weather_service.weather_cache) == 1
+
+
+def test_loader_error_reaches_all_waiters():
+    cache = TTLCache()
+    calls = 0
+
+    async def loader():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream down")
+
+    async def run():
+        return await asyncio.gather(*(cache.get_or_load("k", loader) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert calls == 1
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert len(cache) == 0
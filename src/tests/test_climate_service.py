@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+from services.climate_service import ClimateNormals
+
+
+def linear_normals(nlat: int = 4, nlon: int = 5, step: float = 1.0) -> ClimateNormals:
+    """Температура растёт на 10 °C на строку и на 1 °C на столбец, осадки — константа по месяцу."""
+    rows, cols = np.meshgrid(np.arange(nlat), np.arange(nlon), indexing="ij")
+    tavg = np.repeat((rows * 10 + cols)[..., None], 12, axis=2).astype(np.float32)
+    prec = np.broadcast_to(np.arange(1, 13, dtype=np.float32), (nlat, nlon, 12)).copy()
+    return ClimateNormals(tavg, prec, lat0=40.0, lon0=10.0, step=step)
+
+
+def test_bilinear_interpolates_linear_field():
+    normals = linear_normals()
+    lat = np.array([40.0, 40.5, 41.25, 42.0])
+    lon = np.array([10.0, 10.5, 12.75, 13.0])
+    tavg, prec = normals.bilinear(lat, lon)
+    assert tavg.shape == prec.shape == (4, 12)
+    np.testing.assert_allclose(tavg[:, 0], [0.0, 5.5, 15.25, 23.0], atol=1e-4)
+    np.testing.assert_allclose(prec, np.tile(np.arange(1, 13), (4, 1)), atol=1e-4)
+
+
+def test_bilinear_matches_single_point_path():
+    normals = linear_normals()
+    lat, lon = np.array([40.3, 41.7, 42.9]), np.array([10.1, 12.2, 13.8])
+    tavg, prec = normals.lookup(lat, lon)
+    for i in range(len(lat)):
+        point_tavg, point_prec = normals.lookup(lat[i], lon[i])
+        np.testing.assert_allclose(tavg[i], point_tavg, atol=1e-4)
+        np.testing.assert_allclose(prec[i], point_prec, atol=1e-4)
+
+
+def test_bilinear_skips_nodata_cells():
+    normals = linear_normals()
+    normals.tavg[1, 1] = np.nan  # ячейка без данных (например, море)
+    normals.prec[1, 1] = np.nan
+    tavg, _ = normals.bilinear(np.array([40.5]), np.array([10.5]))
+    # Остальные три соседа с равными весами: (0 + 1 + 10) / 3
+    assert tavg[0, 0] == pytest.approx(11 / 3, abs=1e-4)
+    point_tavg, _ = normals.point(40.5, 10.5)
+    assert point_tavg[0] == pytest.approx(11 / 3)
+
+    # Точно в ячейке без данных и вне сетки — NaN
+    tavg, prec = normals.bilinear(np.array([41.0, 30.0]), np.array([11.0, 11.0]))
+    assert np.isnan(tavg).all() and np.isnan(prec).all()
+
+
+def test_nearest_and_elevation():
+    normals = linear_normals()
+    normals.elev = np.arange(20, dtype=np.float32).reshape(4, 5) * 100
+    tavg, _ = normals.nearest(np.array([41.4, 42.6, 50.0]), np.array([11.6, 10.2, 11.0]))
+    assert tavg[0, 0] == 12.0 and tavg[1, 0] == 30.0
+    assert np.isnan(tavg[2]).all()
+    np.testing.assert_array_equal(normals.elevation(np.array([41.4]), np.array([11.6])), [700.0])
+
+
+def test_longitude_wraps_on_global_grid():
+    # 8 столбцов по 45°: центры -157.5 ... 157.5, за 157.5 снова -157.5
+    cols = np.arange(8, dtype=np.float32)
+    tavg = np.repeat(np.tile(cols, (3, 1))[..., None], 12, axis=2)
+    normals = ClimateNormals(tavg, np.ones_like(tavg), lat0=-45.0, lon0=-157.5, step=45.0)
+    assert normals.wraps
+
+    tavg, _ = normals.bilinear(np.array([0.0, 0.0, 0.0]), np.array([180.0, -180.0, 540.0]))
+    np.testing.assert_allclose(tavg[:, 0], [3.5, 3.5, 3.5], atol=1e-4)  # между столбцами 7 и 0
+    assert normals.point(0.0, 180.0)[0][0] == pytest.approx(3.5)
+    nearest, _ = normals.nearest(np.array([0.0, 0.0]), np.array([170.0, -175.0]))
+    np.testing.assert_array_equal(nearest[:, 0], [7.0, 0.0])
+
+
+def test_regional_grid_does_not_wrap():
+    normals = linear_normals()
+    assert not normals.wraps
+    # За восточным краем соседа нет: остаётся только крайний столбец, а не первый
+    tavg, _ = normals.bilinear(np.array([41.0]), np.array([14.5]))
+    assert tavg[0, 0] == pytest.approx(14.0)
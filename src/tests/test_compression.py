@@ -0,0 +1,27 @@
+def test_vary_on_every_compressible_response(client):
+    for encoding in ("identity", "gzip"):
+        # Большой ответ и маленькие (ниже COMPRESSION_MIN_SIZE)
+        for path, params in (("/crops/search", {"q": "a", "limit": 100}), ("/crops/", {"name": "maize"}),
+                             ("/crops/search", {"q": "zzzzzz"})):
+            response = client.get(path, params=params, headers={"Accept-Encoding": encoding})
+            assert response.headers["vary"] == "Accept-Encoding", (path, encoding)
+
+
+def test_vary_not_duplicated_when_compressed(client):
+    response = client.get("/crops/search", params={"q": "a", "limit": 100}, headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers.get_list("vary") == ["Accept-Encoding"]
+
+
+def test_crop_etag_same_for_200_and_304(client):
+    plain = client.get("/crops/", params={"name": "maize"}, headers={"Accept-Encoding": "identity"})
+    gzipped = client.get("/crops/", params={"name": "maize"}, headers={"Accept-Encoding": "gzip"})
+    etag = plain.headers["etag"]
+    assert etag.startswith('W/"') and gzipped.headers["etag"] == etag
+
+    for if_none_match in (etag, etag.removeprefix("W/")):
+        cached = client.get("/crops/", params={"name": "maize"},
+                            headers={"Accept-Encoding": "gzip", "If-None-Match": if_none_match})
+        assert cached.status_code == 304
+        assert cached.headers["etag"] == etag
+        assert cached.headers["vary"] == "Accept-Encoding"
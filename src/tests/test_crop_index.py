@@ -0,0 +1,49 @@
+from services.crop_index import CropNameIndex
+
+SCIENTIFIC = ["Coffea arabica", "Triticum aestivum", "Triticum durum", "Zea mays", "Sorghum bicolor"]
+COMMON = ["arabica coffee", "bread wheat", "durum wheat", "maize, corn", "sorghum"]
+
+
+def make_index() -> CropNameIndex:
+    return CropNameIndex(SCIENTIFIC, [None] * len(SCIENTIFIC), COMMON)
+
+
+def test_one_edit_typo():
+    total, hits = make_index().search("maiz")
+    assert hits[0]["row"] == 3
+
+
+def test_two_edit_typo_finds_crop():
+    index = make_index()
+    # Обе опечатки требуют удаления символа на стороне термина
+    for query, row in (("cofea arabika", 0), ("trticum astivum", 1)):
+        total, hits = index.search(query)
+        assert total > 0
+        assert hits[0]["row"] == row
+        assert hits[0]["kind"] == "fuzzy"
+        assert hits[0]["distance"] == 2
+
+
+def test_two_edits_not_allowed_for_short_query():
+    # Для запросов короче 8 символов допускается одна правка
+    total, _ = make_index().search("wxeet")
+    assert total == 0
+
+
+def test_shared_common_name_goes_to_crop_that_lists_it_first():
+    index = CropNameIndex(["Persea americana", "Pisum sativum"], [None, None],
+                          ["avocado, aguacate, pea", "pea, garden pea"])
+    assert index.lookup("pea") == 1
+    total, hits = index.search("pea")
+    assert [hit["row"] for hit in hits[:2]] == [1, 0]
+
+
+def test_shared_common_names_in_ecocrop():
+    from services.ecocrop_service import EcoCropService
+
+    service = EcoCropService()
+    for name, scientific in (("pea", "pisum sativum"),
+                             ("broccoli", "brassica oleracea var. italica"),
+                             ("chinese cabbage", "brassica chinensis")):
+        assert service.get_crop(name)["ScientificName"] == scientific
+        assert service.search(name, limit=1)["results"][0]["ScientificName"] == scientific
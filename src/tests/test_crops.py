@@ -0,0 +1,8 @@
+def test_crop_is_revalidated_on_every_use(client):
+    response = client.get("/crops/", params={"name": "maize"})
+    assert response.status_code == 200
+    assert response.headers["cache-control"] == "no-cache"
+
+    cached = client.get("/crops/", params={"name": "maize"}, headers={"If-None-Match": response.headers["etag"]})
+    assert cached.status_code == 304
+    assert cached.headers["cache-control"] == "no-cache"
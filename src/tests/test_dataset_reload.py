@@ -0,0 +1,105 @@
+import asyncio
+import logging
+import os
+import shutil
+import pytest
+from config import ECOCROP_PATH
+from services import ecocrop_service as ecocrop_module
+from services.ecocrop_service import LazyEcoCropService
+from services.ecocrop_snapshot import dataset_version
+
+
+@pytest.fixture
+def dataset(tmp_path, monkeypatch):
+    """Сервис на копии CSV; заголовок X-Dataset-Version берёт версию у него."""
+    path = str(tmp_path / "EcoCrop_DB.csv")
+    shutil.copyfile(ECOCROP_PATH, path)
+    service = LazyEcoCropService(path)
+    monkeypatch.setattr(ecocrop_module, "ecocrop_service", service)
+    return service, path
+
+
+def _replace(path: str, content: bytes):
+    # Как при выкладке новой версии: запись рядом и атомарная замена
+    with open(path + ".new", "wb") as f:
+        f.write(content)
+    os.replace(path + ".new", path)
+
+
+def test_reload_switches_version(client, dataset):
+    service, path = dataset
+    rows = len(service.load().table)
+    old = service.version
+    assert client.get("/").headers["x-dataset-version"] == old
+    assert service.reload_if_changed() is False  # файл не менялся
+
+    with open(path, "rb") as f:
+        content = f.read()
+    last_line = content.rstrip(b"\r\n").rsplit(b"\n", 1)[-1]
+    _replace(path, content.rstrip(b"\r\n") + b"\n" + last_line + b"\n")
+
+    assert service.reload_if_changed() is True
+    assert service.version == dataset_version(path) != old
+    assert client.get("/").headers["x-dataset-version"] == service.version
+    assert len(service.current().table) == rows + 1
+
+
+def test_broken_csv_keeps_old_version(client, dataset):
+    service, path = dataset
+    old = service.load()
+    _replace(path, b"not,an,ecocrop\nfile,at,all\n")
+
+    assert service.reload_if_changed() is False
+    assert service.current() is old
+    assert client.get("/").headers["x-dataset-version"] == old.version
+    # Тот же сломанный файл повторно не пересобирается
+    assert service.reload_if_changed() is False
+
+
+def test_watcher_survives_errors(monkeypatch, caplog):
+    import main
+
+    calls = 0
+
+    class Flaky:
+        def reload_if_changed(self):
+            nonlocal calls
+            calls += 1
+            if calls == 1:
+                raise FileNotFoundError("symlink repointed mid-stat")
+            return False
+
+    monkeypatch.setattr(main, "ecocrop_service", Flaky())
+    monkeypatch.setattr(main, "ECOCROP_RELOAD_INTERVAL", 0.01)
+
+    async def run():
+        task = asyncio.create_task(main._watch_dataset())
+        while calls < 3:
+            await asyncio.sleep(0.01)
+        assert not task.done()
+        task.cancel()
+
+    with caplog.at_level(logging.ERROR):
+        asyncio.run(asyncio.wait_for(run(), 5))
+    assert "EcoCrop dataset check failed" in caplog.text
+
+
+def test_background_warm_up_failure_is_logged(monkeypatch, caplog):
+    import main
+    from fastapi.testclient import TestClient
+
+    class Broken:
+        def warm_up(self):
+            raise RuntimeError("EcoCrop CSV not found")
+
+    monkeypatch.setattr(main, "ecocrop_service", Broken())
+    monkeypatch.setattr(main, "ECOCROP_WARMUP", "background")
+    monkeypatch.setattr(main, "ECOCROP_RELOAD_INTERVAL", 0)
+
+    with caplog.at_level(logging.ERROR), TestClient(main.app) as client:
+        for _ in range(100):
+            if "warm-up failed" in caplog.text:
+                break
+            client.get("/")
+    assert "EcoCrop background warm-up failed" in caplog.text
+    assert "EcoCrop CSV not found" in caplog.text
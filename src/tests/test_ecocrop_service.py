@@ -0,0 +1,51 @@
+import asyncio
+from services.ecocrop_service import LazyEcoCropService
+
+
+def test_acurrent_does_not_block_event_loop_while_loading():
+    service = LazyEcoCropService()
+
+    async def run():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        # Замок держит «прогрев» в другом потоке — как при warm_up на старте
+        service._lock.acquire()
+        background = asyncio.create_task(ticker())
+        pending = asyncio.create_task(service.acurrent())
+        await asyncio.sleep(0.1)
+        assert not pending.done() and ticks >= 5
+        service._lock.release()
+        loaded = await pending
+        background.cancel()
+        return loaded
+
+    loaded = asyncio.run(run())
+    assert loaded is service.current() and len(loaded.table) > 0
+
+
+def test_recommend_ranks_crops_with_primary_ranges_first():
+    service = LazyEcoCropService().current()
+    # При -30 °C культуры с известной температурой получают 0, а без
+    # диапазонов температуры и осадков — высокую оценку по одной широте
+    crops = service.recommend(limit=20, temp=-30, rain=900, lat=45)
+    assert crops
+    assert all(crop["factors"]["temperature"] is not None for crop in crops)
+
+
+def test_crop_record_returns_copy(caplog):
+    service = LazyEcoCropService().current()
+    row = service.find_row("maize")
+    service._records.pop(row, None)
+    with caplog.at_level("DEBUG", logger="agro.ecocrop"):
+        record = service.get_crop("maize")
+    assert any(r.name == "agro.ecocrop" and f"#{row}" in r.getMessage() for r in caplog.records)
+
+    record["ScientificName"] = "changed"
+    record.clear()
+    assert service.get_crop("maize")["ScientificName"] == service.index.scientific[row]
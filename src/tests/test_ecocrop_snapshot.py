@@ -0,0 +1,90 @@
+import json
+import os
+import shutil
+import numpy as np
+import pytest
+from config import ECOCROP_PATH
+from services.ecocrop_snapshot import MAGIC, build_snapshot, load_snapshot, load_table
+
+
+@pytest.fixture
+def snapshot(tmp_path):
+    """Копия CSV и снимок, собранный по ней."""
+    csv_path = str(tmp_path / "EcoCrop_DB.csv")
+    shutil.copyfile(ECOCROP_PATH, csv_path)
+    return build_snapshot(csv_path), csv_path
+
+
+def _rewrite_header(path: str, edit):
+    with open(path, "rb") as f:
+        content = f.read()
+    prefix = len(MAGIC) + 8
+    size = int(np.frombuffer(content[len(MAGIC):prefix], dtype=np.uint64)[0])
+    header = json.loads(content[prefix:prefix + size])
+    edit(header)
+    encoded = json.dumps(header, ensure_ascii=False).encode("utf-8").ljust(size)
+    assert len(encoded) == size
+    with open(path, "wb") as f:
+        f.write(content[:prefix] + encoded + content[prefix + size:])
+
+
+def test_snapshot_round_trip(snapshot):
+    path, csv_path = snapshot
+    table = load_snapshot(path, csv_path)
+    assert table is not None and len(table) > 0
+    assert table.record(0) == load_table(csv_path, path + ".missing").record(0)
+
+
+def test_truncated_snapshot_is_rejected(snapshot):
+    path, csv_path = snapshot
+    with open(path, "r+b") as f:
+        f.truncate(os.path.getsize(path) - 64)
+    assert load_snapshot(path, csv_path) is None
+    assert len(load_table(csv_path, path)) > 0
+
+
+def test_truncated_header_is_rejected(snapshot):
+    path, csv_path = snapshot
+    with open(path, "r+b") as f:
+        f.truncate(len(MAGIC) + 8 + 16)
+    assert load_snapshot(path, csv_path) is None
+
+
+def test_corrupt_header_is_rejected(snapshot):
+    path, csv_path = snapshot
+    with open(path, "r+b") as f:
+        f.seek(len(MAGIC) + 8)
+        f.write(b"\xff\xfe{")
+    assert load_snapshot(path, csv_path) is None
+
+
+def test_array_row_count_mismatch_is_rejected(snapshot):
+    path, csv_path = snapshot
+
+    def shorten(header):
+        name = next(iter(header["arrays"]))
+        header["arrays"][name]["count"] -= 1
+
+    _rewrite_header(path, shorten)
+    assert load_snapshot(path) is None
+
+
+def test_service_hashes_csv_once(snapshot, monkeypatch):
+    import hashlib
+    from types import SimpleNamespace
+    from services import ecocrop_snapshot
+    from services.ecocrop_service import EcoCropService
+
+    path, csv_path = snapshot
+    calls = []
+
+    def sha256(data):
+        calls.append(len(data))
+        return hashlib.sha256(data)
+
+    monkeypatch.setattr(ecocrop_snapshot, "hashlib", SimpleNamespace(sha256=sha256))
+    service = EcoCropService(csv_path)
+    assert len(calls) == 1
+    # Таблица взята из снимка (mmap), а не разобрана из CSV
+    assert isinstance(next(iter(service.table.numeric.values())), np.memmap)
+    assert service.version == ecocrop_snapshot.dataset_version(csv_path)
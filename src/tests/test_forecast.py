@@ -0,0 +1,105 @@
+from types import SimpleNamespace
+import numpy as np
+import pytest
+from services.ecocrop_service import EcoCropService
+from services.suitability_service import risk_windows, score_forecast
+
+nan = np.nan
+
+# Культура 0 — с диапазонами и температурой гибели, культура 1 — без данных
+RANGES = {
+    "TOPMN": np.array([15.0, nan]), "TOPMX": np.array([25.0, nan]),
+    "TMIN": np.array([5.0, nan]), "TMAX": np.array([35.0, nan]),
+    "KTMP": np.array([-2.0, nan]),
+}
+
+START = 1767225600  # 2026-01-01T00:00Z
+STEP = 3 * 3600
+
+
+def make_forecast(timezone: int = 0) -> dict:
+    """Двое суток по 3 часа: первые — в оптимуме, вторые — заморозок утром и жара днём."""
+    temp = np.full(16, 20.0)
+    temp_min = temp - 1
+    temp_max = temp + 1
+    temp[8:11], temp_min[8:11] = 0.0, -3.0     # 02.01 00:00–09:00: заморозок и холод
+    temp[13], temp_max[13] = 30.0, 38.0        # 02.01 15:00: жара
+    return {"dt": START + STEP * np.arange(16), "timezone": timezone,
+            "temp": temp, "temp_min": temp_min, "temp_max": temp_max}
+
+
+def test_risk_windows():
+    assert risk_windows([False, True, True, False, True]) == [(1, 2), (4, 4)]
+    assert risk_windows([True]) == [(0, 0)]
+    assert risk_windows([False, False]) == []
+
+
+def test_score_forecast_flags_and_totals():
+    forecast = make_forecast()
+    scores = score_forecast(RANGES, forecast["temp"], forecast["temp_min"], forecast["temp_max"])
+    assert scores["temperature"].shape == (16, 2)
+    assert risk_windows(scores["frost"][:, 0]) == [(8, 10)]
+    assert risk_windows(scores["cold"][:, 0]) == [(8, 10)]
+    assert risk_windows(scores["heat"][:, 0]) == [(13, 13)]
+    assert scores["mean"][0] == pytest.approx(12.5 / 16)
+    assert scores["min"][0] == 0.0
+    assert scores["optimal_share"][0] == pytest.approx(12 / 16)
+    # Угроза гибели от заморозка обнуляет итог, несмотря на высокое среднее
+    assert scores["total"][0] == 0.0
+    # Без диапазонов и KTMP — ни оценок, ни флагов
+    assert np.isnan(scores["total"][1]) and np.isnan(scores["mean"][1])
+    assert not scores["frost"][:, 1].any()
+
+
+def test_score_forecast_without_frost_uses_mean():
+    forecast = make_forecast()
+    forecast["temp_min"][8:11] = 3.0  # холодно, но выше KTMP
+    scores = score_forecast(RANGES, forecast["temp"], forecast["temp_min"], forecast["temp_max"])
+    assert not scores["frost"].any()
+    assert scores["total"][0] == pytest.approx(scores["mean"][0])
+
+
+def _outlook(forecast: dict, row: int = 0) -> dict:
+    # Нужны только диапазоны культур — без загрузки базы
+    return EcoCropService.forecast_outlook(SimpleNamespace(ranges=RANGES), row, forecast)
+
+
+def test_forecast_outlook_risks_and_days():
+    outlook = _outlook(make_forecast())
+    assert outlook["score"] == 0.0
+    assert outlook["thresholds"] == {"TOPMN": 15.0, "TOPMX": 25.0, "TMIN": 5.0, "TMAX": 35.0, "KTMP": -2.0}
+    assert outlook["risks"] == [
+        {"kind": "frost", "start": "2026-01-02T00:00+00:00", "end": "2026-01-02T09:00+00:00",
+         "hours": 9, "temp": -3.0, "threshold": -2.0},
+        {"kind": "cold", "start": "2026-01-02T00:00+00:00", "end": "2026-01-02T09:00+00:00",
+         "hours": 9, "temp": -3.0, "threshold": 5.0},
+        {"kind": "heat", "start": "2026-01-02T15:00+00:00", "end": "2026-01-02T18:00+00:00",
+         "hours": 3, "temp": 38.0, "threshold": 35.0},
+    ]
+    first, second = outlook["days"]
+    assert first == {"date": "2026-01-01", "temp_min": 19.0, "temp_max": 21.0, "score": 1.0, "risks": []}
+    assert second["date"] == "2026-01-02"
+    assert (second["temp_min"], second["temp_max"]) == (-3.0, 38.0)
+    assert second["score"] == pytest.approx(4.5 / 8, abs=1e-3)
+    assert second["risks"] == ["frost", "cold", "heat"]
+    assert len(outlook["steps"]) == 16
+
+
+def test_forecast_outlook_days_follow_local_date():
+    # UTC+3: шаг 21:00Z — уже 00:00 следующих местных суток
+    days = _outlook(make_forecast(timezone=3 * 3600))["days"]
+    assert [day["date"] for day in days] == ["2026-01-01", "2026-01-02", "2026-01-03"]
+    # Заморозок 00:00–09:00Z приходится на местные 03:00–12:00 вторых суток
+    assert [day["risks"] for day in days] == [[], ["frost", "cold", "heat"], []]
+
+
+def test_forecast_outlook_without_ranges():
+    outlook = _outlook(make_forecast(), row=1)
+    assert outlook["score"] is None and outlook["risks"] == []
+    assert all(day["score"] is None for day in outlook["days"])
+
+
+def test_compact_crop_keeps_killing_temperature(client):
+    crop = client.get("/crops/", params={"name": "maize", "compact": True}).json()
+    assert "KTMP" in crop
+    assert set(crop) == set(EcoCropService.COMPACT_FIELDS)
@@ -0,0 +1,40 @@
+import asyncio
+import httpx
+from services.location_service import LocationResolver, LocationStore
+from services.weather_service import WeatherClient
+from stubs.openweather import create_app
+
+
+def test_resolve_saves_new_place_off_the_event_loop(tmp_path, monkeypatch):
+    stub = create_app()
+    client = WeatherClient(base_url="http://stub/data/2.5", transport=httpx.ASGITransport(app=stub))
+    resolver = LocationResolver(client, store_path=str(tmp_path / "locations.sqlite"), geocoding_url="http://stub/geo/1.0")
+
+    called_in_loop = []
+    add = LocationStore.add
+
+    def spy(self, alias, location):
+        called_in_loop.append(_in_loop())
+        return add(self, alias, location)
+
+    monkeypatch.setattr(LocationStore, "add", spy)
+
+    async def run():
+        first = await resolver.resolve("Paris")
+        alias = await resolver.resolve(" paris ")
+        await client.aclose()
+        return first, alias
+
+    first, alias = asyncio.run(run())
+    assert "error" not in first and alias == first
+    assert called_in_loop == [False]
+    assert stub.state.geocoding_requests == 1
+    assert LocationStore(resolver.store_path).get("paris") == first
+
+
+def _in_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
@@ -0,0 +1,34 @@
+import threading
+from fastapi.testclient import TestClient
+from services.metrics import Counter, Histogram
+
+
+def test_concurrent_updates_are_not_lost():
+    counter = Counter("test_total", "test", ("kind",))
+    histogram = Histogram("test_seconds", "test")
+
+    def work():
+        for _ in range(20000):
+            counter.inc(kind="a")
+            histogram.observe(0.001)
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert counter._values[("a",)] == 80000
+    assert sum(histogram._series[()][0]) == 80000
+
+
+def test_request_metrics_use_full_route_template():
+    import main
+
+    main.ECOCROP_WARMUP = "lazy"
+    with TestClient(main.app) as client:
+        client.get("/crops/search", params={"q": "maize"})
+        client.get("/no/such/path")
+        text = client.get("/metrics").text
+    assert 'route="/crops/search",status="200"' in text
+    assert 'route="unmatched",status="404"' in text
+    assert 'route="/search"' not in text
@@ -0,0 +1,123 @@
+import asyncio
+import struct
+import zlib
+import numpy as np
+import pytest
+from routers import raster as raster_router
+from services import raster_service
+from services.climate_service import ClimateNormals
+from services.raster_service import NODATA, RasterGrid, render_strip, stream_png
+from services.suitability_service import RANGE_KEYS, best_season
+
+nan = np.nan
+
+# Одна культура: оптимум 15–25 °C, 600–1200 мм за сезон в 3 месяца
+RANGES = {key: np.array([nan]) for key in RANGE_KEYS}
+RANGES.update({
+    "TOPMN": np.array([15.0]), "TOPMX": np.array([25.0]), "TMIN": np.array([5.0]), "TMAX": np.array([35.0]),
+    "ROPMN": np.array([600.0]), "ROPMX": np.array([1200.0]), "RMIN": np.array([300.0]), "RMAX": np.array([2000.0]),
+    "GMIN": np.array([90.0]), "GMAX": np.array([90.0]),
+})
+
+
+def test_best_season_picks_sowing_month():
+    summer = np.where(np.isin(np.arange(12), [5, 6, 7]), 20.0, 0.0)  # тепло только в июне–августе
+    tavg = np.array([np.full(12, 20.0), summer, np.full(12, -10.0), np.full(12, nan)])
+    prec = np.full((4, 12), 250.0)
+    score, month = best_season(RANGES, tavg, prec)
+    np.testing.assert_allclose(score[:3], [1.0, 1.0, 0.0])
+    assert np.isnan(score[3])
+    assert month[1] == 6
+
+
+def test_best_season_rain_sums_over_season():
+    tavg = np.full((2, 12), 20.0)
+    prec = np.array([np.full(12, 100.0), np.full(12, 200.0)])  # 300 и 600 мм за 3 месяца
+    score, _ = best_season(RANGES, tavg, prec)
+    np.testing.assert_allclose(score, [0.0, 1.0])
+
+
+@pytest.fixture
+def normals(monkeypatch):
+    """Сетка 2 × 3 с центрами 40–41° с. ш., 10–12° в. д.; одна ячейка без данных, одна холодная."""
+    tavg = np.full((2, 3, 12), 20.0, dtype=np.float32)
+    prec = np.full((2, 3, 12), 250.0, dtype=np.float32)
+    tavg[0, 2] = prec[0, 2] = nan
+    tavg[1, 0] = -10.0
+    normals = ClimateNormals(tavg, prec, lat0=40.0, lon0=10.0, step=1.0)
+    monkeypatch.setattr(raster_service, "get_normals", lambda: normals)
+    monkeypatch.setattr(raster_router, "get_normals", lambda: normals)
+    return normals
+
+
+# Строки растра идут с севера на юг
+EXPECTED = [[0, 100, 100], [100, 100, NODATA]]
+
+
+def test_render_strip(normals):
+    data = render_strip(RANGES, west=9.5, north=41.5, res=1.0, width=3, row0=0, rows=2)
+    assert np.frombuffer(data, dtype=np.uint8).reshape(2, 3).tolist() == EXPECTED
+    # Вторая полоса — только южная строка
+    data = render_strip(RANGES, west=9.5, north=41.5, res=1.0, width=3, row0=1, rows=1)
+    assert list(data) == EXPECTED[1]
+
+
+def decode_png(data: bytes) -> dict:
+    """Минимальный разбор PNG с палитрой: чанки, CRC, IDAT без фильтров."""
+    assert data[:8] == b"\x89PNG\r\n\x1a\n"
+    chunks, pos = [], 8
+    while pos < len(data):
+        length, kind = struct.unpack(">I4s", data[pos:pos + 8])
+        body = data[pos + 8:pos + 8 + length]
+        (crc,) = struct.unpack(">I", data[pos + 8 + length:pos + 12 + length])
+        assert crc == zlib.crc32(kind + body)
+        chunks.append((kind, body))
+        pos += 12 + length
+    kinds = [kind for kind, _ in chunks]
+    assert kinds[:4] == [b"IHDR", b"PLTE", b"tRNS", b"IDAT"] and kinds[-1] == b"IEND"
+    width, height, depth, color = struct.unpack(">IIBB", chunks[0][1][:10])
+    raw = zlib.decompress(b"".join(body for kind, body in chunks if kind == b"IDAT"))
+    rows = np.frombuffer(raw, dtype=np.uint8).reshape(height, width + 1)
+    assert (rows[:, 0] == 0).all()  # фильтр None в каждой строке
+    return {"width": width, "height": height, "depth": depth, "color": color, "idat": kinds.count(b"IDAT"),
+            "palette": chunks[1][1], "alpha": chunks[2][1], "pixels": rows[:, 1:]}
+
+
+def test_stream_png_decodes_to_strips():
+    pixels = np.arange(6 * 5, dtype=np.uint8).reshape(6, 5)
+    pixels[2, 3] = NODATA
+
+    async def strips():
+        for start in range(0, 6, 2):  # три полосы по две строки
+            yield pixels[start:start + 2].tobytes()
+
+    async def collect():
+        return b"".join([chunk async for chunk in stream_png(strips(), 5, 6)])
+
+    png = decode_png(asyncio.run(collect()))
+    assert (png["width"], png["height"], png["depth"], png["color"]) == (5, 6, 8, 3)
+    np.testing.assert_array_equal(png["pixels"], pixels)
+    assert len(png["palette"]) == 256 * 3
+    assert png["alpha"][NODATA] == 0 and png["alpha"][100] == 255
+    # 0 — красный, 100 — зелёный
+    assert png["palette"][:3] == bytes((215, 48, 39)) and png["palette"][300:303] == bytes((26, 152, 80))
+
+
+def test_raster_grid_strips_cover_height(monkeypatch):
+    monkeypatch.setattr(raster_service, "RASTER_TILE_CELLS", 10)
+    grid = RasterGrid(0, 0, 4, 7, 1)
+    assert (grid.width, grid.height) == (4, 7)
+    assert grid.strips() == [(0, 2), (2, 2), (4, 2), (6, 1)]
+
+
+def test_raster_endpoint_png(client, normals):
+    response = client.get("/raster/suitability", params={"crop": "maize", "bbox": "9.5,39.5,12.5,41.5", "res": 1})
+    assert response.status_code == 200 and response.headers["content-type"] == "image/png"
+    assert response.headers["x-raster-width"] == "3" and response.headers["x-raster-height"] == "2"
+    png = decode_png(response.content)
+    assert png["pixels"][1, 2] == NODATA  # ячейка без климатических данных
+    assert (png["pixels"][png["pixels"] != NODATA] <= 100).all()
+
+    raw = client.get("/raster/suitability", params={"crop": "maize", "bbox": "9.5,39.5,12.5,41.5", "res": 1,
+                                                    "format": "bin"}).content
+    np.testing.assert_array_equal(np.frombuffer(raw, dtype=np.uint8).reshape(2, 3), png["pixels"])
@@ -0,0 +1,116 @@
+import numpy as np
+import pytest
+from services.suitability_service import (
+    calculate_suitability, describe_factors, graded_score, photoperiod_mask, photoperiod_score, score_crops,
+)
+
+nan = np.nan
+
+# Условная культура: оптимум 20–30 °C при границах 10–40 °C и т. д.
+CROP = {
+    "TOPMN": 20.0, "TOPMX": 30.0, "TMIN": 10.0, "TMAX": 40.0,
+    "ROPMN": 600.0, "ROPMX": 1200.0, "RMIN": 400.0, "RMAX": 1800.0,
+    "PHOPMN": None, "PHOPMX": None, "PHMIN": None, "PHMAX": None,
+    "LATOPMN": 10.0, "LATOPMX": 40.0, "LATMN": 20.0, "LATMX": 50.0,
+    "ALTMX": 2000.0, "PHOTO": "short day (<12 hours)",
+}
+
+
+@pytest.mark.parametrize("value, expected", [
+    (20, 1.0), (25, 1.0), (30, 1.0),  # оптимум и его границы
+    (15, 0.5), (12.5, 0.25),          # допустимая полоса снизу
+    (35, 0.5),                        # допустимая полоса сверху
+    (10, 0.0), (5, 0.0), (45, 0.0),   # на абсолютной границе и за ней
+])
+def test_graded_score_bands(value, expected):
+    assert graded_score(value, 20, 30, 10, 40) == pytest.approx(expected)
+
+
+def test_graded_score_missing_ranges():
+    # Нет оптимума — берётся абсолютный диапазон
+    assert graded_score(12, nan, nan, 10, 40) == 1.0
+    assert graded_score(5, nan, nan, 10, 40) == 0.0
+    # Нет абсолютного диапазона — оценка ступенькой по оптимуму
+    assert graded_score(19, 20, 30, nan, nan) == 0.0
+    # Известна только верхняя граница: нижняя не ограничивает
+    assert graded_score(-50, nan, 30, nan, nan) == 1.0
+    # Нет ничего или нет значения — фактор не учитывается
+    assert np.isnan(graded_score(25, nan, nan, nan, nan))
+    assert np.isnan(graded_score(nan, 20, 30, 10, 40))
+
+
+def test_graded_score_broadcasts_places_by_crops():
+    scores = graded_score(np.array([[15.0], [25.0]]), np.array([20.0, 10.0]), np.array([30.0, 12.0]),
+                          np.array([10.0, 5.0]), np.array([40.0, 20.0]))
+    assert scores.shape == (2, 2)
+    np.testing.assert_allclose(scores, [[0.5, 0.625], [1.0, 0.0]])
+
+
+@pytest.mark.parametrize("lat, expected", [
+    (-10, 1.0), (25, 1.0),  # оптимум от 10° ю. ш. до 40° с. ш.
+    (-15, 0.5), (-20, 0.0), (-30, 0.0),  # LATMN — южная граница
+    (45, 0.5), (55, 0.0),
+])
+def test_latitude_southern_limit(lat, expected):
+    assert calculate_suitability(CROP, lat=lat)["latitude"] == pytest.approx(expected)
+
+
+def test_photoperiod_mask():
+    masks = photoperiod_mask(["short day (<12 hours)", "neutral day (12-14 hours), long day (>14 hours)",
+                              "not sensitive", None, "unknown"])
+    np.testing.assert_array_equal(masks[:3], [1, 6, 7])
+    assert np.isnan(masks[3]) and np.isnan(masks[4])
+
+
+def test_photoperiod_score():
+    short, neutral_long, any_day = photoperiod_mask(["short day", "neutral day, long day", "not sensitive"])
+    assert photoperiod_score(10, short) == 1.0
+    assert photoperiod_score(13, short) == pytest.approx(0.5)  # за 2 часа до 0
+    assert photoperiod_score(15, short) == 0.0
+    assert photoperiod_score(13, neutral_long) == 1.0
+    assert photoperiod_score(16, neutral_long) == 1.0
+    assert photoperiod_score(11, neutral_long) == pytest.approx(0.5)
+    assert photoperiod_score(20, any_day) == 1.0
+    assert np.isnan(photoperiod_score(12, np.nan))
+
+
+def test_total_is_minimum_of_known_factors():
+    scores = calculate_suitability(CROP, temp=25, rain=500, ph=6.5)
+    assert scores["temperature"] == 1.0
+    assert scores["rainfall"] == 0.5
+    assert scores["ph"] is None  # нет диапазона pH — фактор не учитывается
+    assert scores["total"] == 0.5
+    assert scores["mean"] == 0.75
+
+
+def test_mean_breaks_ties_between_crops():
+    ranges = {
+        "TOPMN": np.array([20.0, 20.0]), "TOPMX": np.array([30.0, 30.0]),
+        "TMIN": np.array([10.0, 10.0]), "TMAX": np.array([40.0, 40.0]),
+        "ROPMN": np.array([600.0, 800.0]), "ROPMX": np.array([1200.0, 1000.0]),
+        "RMIN": np.array([400.0, 400.0]), "RMAX": np.array([1800.0, 1200.0]),
+    }
+    # Ограничивающий фактор одинаков, но у первой культуры осадки в оптимуме
+    scores = score_crops(ranges, temp=15, rain=1100)
+    np.testing.assert_allclose(scores["temperature"], [0.5, 0.5])
+    np.testing.assert_allclose(scores["rainfall"], [1.0, 0.5])
+    np.testing.assert_allclose(scores["total"], [0.5, 0.5])
+    np.testing.assert_allclose(scores["mean"], [0.75, 0.5])
+
+
+def test_no_known_factor_gives_nan_total():
+    scores = calculate_suitability({}, temp=25)
+    assert scores["temperature"] is None and scores["total"] is None and scores["mean"] is None
+
+
+def test_describe_factors():
+    conditions = {"temp": 15, "rain": 300, "ph": 6.5, "lat": -25, "day_length": 11.0}
+    scores = calculate_suitability(CROP, **conditions)
+    details = describe_factors(CROP, conditions, scores)
+    assert details == [
+        "⚠️ Temperature is tolerable but not optimal (15°C, optimal 20.0–30.0°C)",
+        "🏜️ Too dry (current 300 mm, needs ≥ 400.0 mm)",
+        "❔ No soil ph range in EcoCrop for this crop.",
+        "❌ Too far south (current -25°, needs ≥ -20.0°)",
+        "☀️ Day length 11.0 h matches the crop (short day (<12 hours)).",
+    ]
@@ -0,0 +1,58 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+import httpx
+from services import weather_service
+from services.weather_service import WeatherClient, retry_after
+
+
+def run_flaky(monkeypatch, *responses):
+    """
+    Клиент с одним слотом, upstream отвечает responses по очереди.
+    Паузы не ждём, а записываем: (длина, занят ли слот клиента).
+    """
+    queue, sleeps = list(responses), []
+    client = WeatherClient(base_url="http://stub", max_concurrency=1, retries=2, backoff=0.2,
+                           transport=httpx.MockTransport(lambda request: queue.pop(0)))
+
+    async def fake_sleep(delay):
+        sleeps.append((delay, client._semaphore.locked()))
+
+    monkeypatch.setattr(weather_service.asyncio, "sleep", fake_sleep)
+
+    async def go():
+        try:
+            return await client.get("/weather")
+        finally:
+            await client.aclose()
+
+    return asyncio.run(go()), sleeps
+
+
+def test_retry_honors_retry_after_and_frees_slot(monkeypatch):
+    response, sleeps = run_flaky(
+        monkeypatch,
+        httpx.Response(429, headers={"Retry-After": "3"}),
+        httpx.Response(200, json={"ok": True}),
+    )
+    assert response.status_code == 200
+    assert sleeps == [(3.0, False)]
+
+
+def test_retry_without_header_uses_backoff(monkeypatch):
+    response, sleeps = run_flaky(monkeypatch, httpx.Response(503), httpx.Response(502), httpx.Response(500))
+    assert response.status_code == 500  # последняя попытка отдаётся как есть
+    assert sleeps == [(0.2, False), (0.4, False)]
+
+
+def test_retry_after_formats():
+    def delay(value):
+        return retry_after(httpx.Response(429, headers={"Retry-After": value}), default=0.5)
+
+    assert delay("2") == 2.0
+    assert delay("-5") == 0.0
+    assert delay("3600") == weather_service.WEATHER_RETRY_AFTER_MAX
+    assert delay("soon") == 0.5
+    assert retry_after(httpx.Response(429), default=0.5) == 0.5
+    when = datetime.now(timezone.utc) + timedelta(seconds=5)
+    assert 3 <= delay(format_datetime(when, usegmt=True)) <= 5